@@ -1,7 +1,6 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 import secrets
@@ -11,25 +10,29 @@ import base64
 from sqlalchemy.orm import Session
 from app.database.db import get_db
 from app.models.user import User as UserModel
+from app.schemas.user import Principal
+from app.auth.credential_cache import credential_cache
+from app.auth.hashing import password_hasher
+from app.auth.login_throttle import login_throttle
 
 load_dotenv()
 
 # Security
 security = HTTPBasic()
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+optional_basic_security = HTTPBasic(auto_error=False)
+bearer_security = HTTPBearer(auto_error=False)
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Sync wrappers; async handlers should await password_hasher directly
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_sync(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash_sync(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -41,19 +44,93 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPBasicCredentials = Depends(security), db: Session = Depends(get_db)):
+# Raised from inside authenticate_basic but not about the credentials themselves
+PASSTHROUGH_STATUS_CODES = (status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+def authenticate_basic(credentials: HTTPBasicCredentials, db: Session, client_ip: Optional[str] = None) -> UserModel:
     try:
+        # Rejects throttled emails/addresses before the user lookup or any bcrypt work
+        login_throttle.check(credentials.username, client_ip)
         user = db.query(UserModel).filter(UserModel.email == credentials.username).first()
-        if not user or not verify_password(credentials.password, user.password_hash):
+        if not user:
+            login_throttle.record_failure(credentials.username, client_ip)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Basic"},
             )
+        # Skip bcrypt when these exact credentials were verified recently
+        if credential_cache.lookup(credentials.username, credentials.password, user.password_hash):
+            return user
+        if not verify_password(credentials.password, user.password_hash):
+            login_throttle.record_failure(credentials.username, client_ip)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect email or password",
+                headers={"WWW-Authenticate": "Basic"},
+            )
+        credential_cache.store(credentials.username, credentials.password, user.password_hash)
         return user
     except Exception as e:
+        # Throttling and a saturated hash pool are capacity problems, not bad credentials
+        if isinstance(e, HTTPException) and e.status_code in PASSTHROUGH_STATUS_CODES:
+            raise
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Basic"},
-        ) 
\ No newline at end of file
+        )
+
+def client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+def get_current_user(request: Request, credentials: HTTPBasicCredentials = Depends(security),
+                     db: Session = Depends(get_db)):
+    return authenticate_basic(credentials, db, client_ip(request))
+
+def decode_access_token(token: str, db: Session) -> Principal:
+    # Signature and expiry are checked in memory; no database access for current tokens
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email = payload.get("sub")
+        user_id = payload.get("user_id")
+        if email is None:
+            raise JWTError("Token is missing required claims")
+        if user_id is None:
+            # Issued before tokens carried user_id; resolve it once from the email
+            user_id = db.query(UserModel.user_id).filter(UserModel.email == email).scalar()
+            if user_id is None:
+                raise JWTError("Token subject no longer exists")
+        return Principal(user_id=user_id, email=email)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def get_current_user_jwt(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_security),
+                         db: Session = Depends(get_db)) -> Principal:
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return decode_access_token(credentials.credentials, db)
+
+def get_current_principal(request: Request,
+                          bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_security),
+                          basic: Optional[HTTPBasicCredentials] = Depends(optional_basic_security),
+                          db: Session = Depends(get_db)) -> Principal:
+    # Bearer tokens are validated statelessly; Basic auth keeps the DB + bcrypt path
+    if bearer is not None:
+        return decode_access_token(bearer.credentials, db)
+    if basic is not None:
+        user = authenticate_basic(basic, db, client_ip(request))
+        return Principal(user_id=user.user_id, email=user.email)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CREDENTIAL_CACHE_ENABLED = os.getenv("CREDENTIAL_CACHE_ENABLED", "true").lower() == "true"
+CREDENTIAL_CACHE_TTL_SECONDS = int(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "300"))
+CREDENTIAL_CACHE_MAXSIZE = int(os.getenv("CREDENTIAL_CACHE_MAXSIZE", "10000"))
+
+
+class VerifiedCredentialCache:
+    # Remembers (email, password) pairs that recently passed bcrypt so repeat
+    # Basic-auth requests can skip the hash. Only HMAC digests are stored: the
+    # key is derived from the credentials and the value pins the password_hash
+    # that was verified, so a password changed by another worker still misses.
+
+    def __init__(self, ttl_seconds: int = CREDENTIAL_CACHE_TTL_SECONDS,
+                 maxsize: int = CREDENTIAL_CACHE_MAXSIZE,
+                 enabled: bool = CREDENTIAL_CACHE_ENABLED):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._keys_by_email = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, *parts: str) -> bytes:
+        message = b"\x00".join(part.encode("utf-8") for part in parts)
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def lookup(self, email: str, password: str, password_hash: str) -> bool:
+        if not self.enabled:
+            return False
+        key = self._digest(email, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False
+            _, hash_digest, expires_at = entry
+            if expires_at < time.monotonic() or not hmac.compare_digest(
+                hash_digest, self._digest(password_hash)
+            ):
+                self._remove(key)
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def store(self, email: str, password: str, password_hash: str) -> None:
+        if not self.enabled:
+            return
+        key = self._digest(email, password)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (email, self._digest(password_hash), expires_at)
+            self._entries.move_to_end(key)
+            self._keys_by_email.setdefault(email, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate_user(self, email: str) -> None:
+        with self._lock:
+            for key in self._keys_by_email.pop(email, set()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_email.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_email.get(entry[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_email[entry[0]]
+
+
+credential_cache = VerifiedCredentialCache()
@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from typing import Optional, Tuple
+import asyncio
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hash jobs allowed to wait for a worker before new ones are turned away with a 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "100"))
+
+# min/max pinned to the configured cost so needs_update() flags hashes made with
+# any other cost, in either direction, and login can rehash them
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    # bcrypt releases the GIL while hashing, so a small dedicated thread pool gives
+    # real parallelism while keeping hash work off the request threadpool and
+    # capping how many cores it can take.
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total_seconds = 0.0
+        self.wait_max_seconds = 0.0
+        self.run_total_seconds = 0.0
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.queued += 1
+            if self.queued > self.peak_queued:
+                self.peak_queued = self.queued
+        return self._executor.submit(self._run, time.perf_counter(), fn, *args)
+
+    def _run(self, submitted_at: float, fn, *args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            waited = started_at - submitted_at
+            self.wait_total_seconds += waited
+            if waited > self.wait_max_seconds:
+                self.wait_max_seconds = waited
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.run_total_seconds += time.perf_counter() - started_at
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(pwd_context.hash, password))
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await asyncio.wrap_future(self._submit(pwd_context.verify, password, password_hash))
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        # The second element is a replacement hash when the stored one uses another cost
+        return await asyncio.wrap_future(self._submit(pwd_context.verify_and_update, password, password_hash))
+
+    # For sync callers (dependencies already running in the threadpool); the
+    # caller's thread waits, but the hashing itself still goes through the pool
+    def hash_sync(self, password: str) -> str:
+        return self._submit(pwd_context.hash, password).result()
+
+    def verify_sync(self, password: str, password_hash: str) -> bool:
+        return self._submit(pwd_context.verify, password, password_hash).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                "workers": self.workers,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "queued": self.queued,
+                "running": self.running,
+                "peak_queued": self.peak_queued,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_avg_ms": self.wait_total_seconds / started * 1000 if started else 0.0,
+                "wait_max_ms": self.wait_max_seconds * 1000,
+                "run_avg_ms": self.run_total_seconds / self.completed * 1000 if self.completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        # Leaves an idle pool in place (threads start on first use) so a later
+        # lifespan in the same process, e.g. a second TestClient, can still hash
+        executor = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
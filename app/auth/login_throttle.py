@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from sqlalchemy import inspect, text
+from typing import Iterable, List, Optional, Tuple
+import logging
+import math
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOGIN_THROTTLE_ENABLED = os.getenv("LOGIN_THROTTLE_ENABLED", "true").lower() == "true"
+# memory (default, per worker) or postgres (shared through the session database)
+LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "memory")
+LOGIN_THROTTLE_EMAIL_BURST = float(os.getenv("LOGIN_THROTTLE_EMAIL_BURST", "10"))
+LOGIN_THROTTLE_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_THROTTLE_EMAIL_PER_MINUTE", "5"))
+# Looser by default since many trackers can sit behind one NAT address
+LOGIN_THROTTLE_IP_BURST = float(os.getenv("LOGIN_THROTTLE_IP_BURST", "100"))
+LOGIN_THROTTLE_IP_PER_MINUTE = float(os.getenv("LOGIN_THROTTLE_IP_PER_MINUTE", "60"))
+LOGIN_THROTTLE_MAXSIZE = int(os.getenv("LOGIN_THROTTLE_MAXSIZE", "100000"))
+
+# One statement per failure: refill by elapsed time, cap at the burst, take a token
+CONSUME_SHARED_TOKEN = text("""
+    INSERT INTO login_throttle (key, tokens, updated_at)
+    VALUES (:key, :burst - 1, now())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = GREATEST(LEAST(:burst, login_throttle.tokens
+            + EXTRACT(EPOCH FROM now() - login_throttle.updated_at) * :rate) - 1, 0),
+        updated_at = now()
+    RETURNING tokens
+""")
+
+
+class TokenBuckets:
+    def __init__(self, burst: float, per_minute: float, maxsize: int = LOGIN_THROTTLE_MAXSIZE):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refilled(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        tokens, updated_at = bucket
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def retry_after(self, key: str) -> float:
+        # Seconds until a token is available; 0 when one is available now
+        with self._lock:
+            tokens = self._refilled(key, time.monotonic())
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate if self.rate else 60.0
+
+    def consume(self, key: str, cap: Optional[float] = None) -> None:
+        # cap lets a shared backend pull this worker's bucket down to the global count
+        now = time.monotonic()
+        with self._lock:
+            tokens = max(self._refilled(key, now) - 1, 0.0)
+            if cap is not None:
+                tokens = min(tokens, cap)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    # Only failed verifications take tokens, so clients with good credentials are
+    # never slowed down. check() only reads this worker's buckets, so an exhausted
+    # key gets its 429 before any database query or bcrypt work. With the postgres
+    # backend each failure is also counted in a shared bucket, and a worker takes
+    # the shared count on its next failure for that key. A key can therefore fail
+    # at most burst + (workers - 1) times in total before every worker blocks it.
+
+    def __init__(self, enabled: bool = LOGIN_THROTTLE_ENABLED, backend: str = LOGIN_THROTTLE_BACKEND):
+        self.enabled = enabled
+        self.backend = backend
+        self.email_buckets = TokenBuckets(LOGIN_THROTTLE_EMAIL_BURST, LOGIN_THROTTLE_EMAIL_PER_MINUTE)
+        self.ip_buckets = TokenBuckets(LOGIN_THROTTLE_IP_BURST, LOGIN_THROTTLE_IP_PER_MINUTE)
+        self.rejected = 0
+
+    def _keys(self, email: Optional[str], client_ip: Optional[str]) -> List[Tuple[TokenBuckets, str]]:
+        keys = []
+        if email:
+            keys.append((self.email_buckets, f"email:{email.lower()}"))
+        if client_ip:
+            keys.append((self.ip_buckets, f"ip:{client_ip}"))
+        return keys
+
+    def check(self, email: Optional[str], client_ip: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        retry_after = max((buckets.retry_after(key) for buckets, key in self._keys(email, client_ip)), default=0.0)
+        if retry_after > 0:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many failed login attempts",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def record_failure(self, email: Optional[str], client_ip: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        keys = self._keys(email, client_ip)
+        shared = self._consume_shared(keys) if self.backend == "postgres" else {}
+        for buckets, key in keys:
+            buckets.consume(key, cap=shared.get(key))
+
+    def _consume_shared(self, keys: Iterable[Tuple[TokenBuckets, str]]) -> dict:
+        # Imported here so the memory backend never needs the session database configured
+        from app.database.session_db import engine as session_engine
+        try:
+            with session_engine.begin() as conn:
+                return {
+                    key: conn.execute(CONSUME_SHARED_TOKEN, {
+                        "key": key, "burst": buckets.burst, "rate": buckets.rate,
+                    }).scalar()
+                    for buckets, key in keys
+                }
+        except Exception as e:
+            # Fall back to this worker's buckets rather than failing the request
+            logger.error("Shared login throttle unavailable: %s", e)
+            return {}
+
+    def verify_backend(self) -> None:
+        # Called at startup so a missing table fails loudly instead of on every failed login
+        if not self.enabled or self.backend != "postgres":
+            return
+        from app.database.session_db import engine as session_engine
+        if not inspect(session_engine).has_table("login_throttle"):
+            raise RuntimeError(
+                "LOGIN_THROTTLE_BACKEND=postgres but the login_throttle table is missing; "
+                "run app/database/migrations/run_migrations.py"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "rejected": self.rejected,
+            "tracked_emails": len(self.email_buckets),
+            "tracked_ips": len(self.ip_buckets),
+        }
+
+
+login_throttle = LoginThrottle()
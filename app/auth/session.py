@@ -1,26 +1,68 @@
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from fastapi import Header, HTTPException, status
+from sqlalchemy import delete, func, insert, select, text, update
 from sqlalchemy.orm import Session
 from app.models.session import Session as SessionModel
 from app.schemas.session import SessionCreate
+from app.database.session_db import SessionLocal
+from collections import OrderedDict, deque
+from typing import List, Optional
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
 import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 SESSION_EXPIRY_HOURS = 12  # you can adjust this
 
-def create_session(db: Session, user_id: int, ip_address: str, device_info: str) -> SessionModel:
-    token = str(uuid.uuid4())
-    expires_at = datetime.utcnow() + timedelta(hours=SESSION_EXPIRY_HOURS)
-    
-    session_data = SessionModel(
+# postgres (default), memory, or write_behind
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "postgres")
+SESSION_CACHE_MAXSIZE = int(os.getenv("SESSION_CACHE_MAXSIZE", "100000"))
+SESSION_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "0.5"))
+SESSION_FLUSH_BATCH_SIZE = int(os.getenv("SESSION_FLUSH_BATCH_SIZE", "1000"))
+# Failed batches are retried whole this many times, then op by op so one bad row
+# can't hold back the rest
+SESSION_FLUSH_MAX_ATTEMPTS = int(os.getenv("SESSION_FLUSH_MAX_ATTEMPTS", "5"))
+# session_ids the write-behind store reserves from the sequence per round trip
+SESSION_ID_BLOCK_SIZE = int(os.getenv("SESSION_ID_BLOCK_SIZE", "100"))
+
+def _new_session(user_id: int, ip_address: str, device_info: str, token: Optional[str] = None,
+                 expires_at: Optional[datetime] = None, session_id: Optional[int] = None) -> SessionModel:
+    now = datetime.utcnow()
+    return SessionModel(
+        session_id=session_id,
         user_id=user_id,
-        token=token,
+        token=token or str(uuid.uuid4()),
         ip_address=ip_address,
         device_info=device_info,
-        expires_at=expires_at,
-        created_at=datetime.utcnow()
+        expires_at=expires_at or now + timedelta(hours=SESSION_EXPIRY_HOURS),
+        created_at=now
     )
+
+def _row(session_obj: SessionModel) -> dict:
+    return {
+        "session_id": session_obj.session_id,
+        "user_id": session_obj.user_id,
+        "token": session_obj.token,
+        "ip_address": session_obj.ip_address,
+        "device_info": session_obj.device_info,
+        "expires_at": session_obj.expires_at,
+        "created_at": session_obj.created_at,
+    }
+
+def create_session(db: Session, user_id: int, ip_address: str, device_info: str,
+                   token: Optional[str] = None, expires_at: Optional[datetime] = None) -> SessionModel:
+    session_data = _new_session(user_id, ip_address, device_info, token, expires_at)
     db.add(session_data)
     db.commit()
-    db.refresh(session_data)
     return session_data
 
 
@@ -42,3 +84,369 @@ def get_active_sessions_for_user(db: Session, user_id: int):
         SessionModel.user_id == user_id,
         SessionModel.expires_at > datetime.utcnow()
     ).all()
+
+
+class SessionStore(ABC):
+    # Lookups only return live sessions: an expired one is treated as gone
+
+    @abstractmethod
+    def create(self, user_id: int, ip_address: str, device_info: str, token: Optional[str] = None,
+               expires_at: Optional[datetime] = None) -> SessionModel:
+        ...
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[SessionModel]:
+        ...
+
+    @abstractmethod
+    def get_by_id(self, session_id: int) -> Optional[SessionModel]:
+        ...
+
+    @abstractmethod
+    def update(self, session_obj: SessionModel, values: dict) -> SessionModel:
+        ...
+
+    @abstractmethod
+    def delete(self, session_obj: SessionModel) -> None:
+        ...
+
+    @abstractmethod
+    def active_for_user(self, user_id: int) -> List[SessionModel]:
+        ...
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresSessionStore(SessionStore):
+    # The original behaviour: every call is a round trip to the session database
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def create(self, user_id: int, ip_address: str, device_info: str, token: Optional[str] = None,
+               expires_at: Optional[datetime] = None) -> SessionModel:
+        with self.session_factory() as db:
+            return create_session(db, user_id, ip_address, device_info, token, expires_at)
+
+    def get(self, token: str) -> Optional[SessionModel]:
+        with self.session_factory() as db:
+            return db.execute(select(SessionModel).where(
+                SessionModel.token == token, SessionModel.expires_at > datetime.utcnow()
+            )).scalars().first()
+
+    def get_by_id(self, session_id: int) -> Optional[SessionModel]:
+        with self.session_factory() as db:
+            return db.execute(select(SessionModel).where(
+                SessionModel.session_id == session_id, SessionModel.expires_at > datetime.utcnow()
+            )).scalars().first()
+
+    def update(self, session_obj: SessionModel, values: dict) -> SessionModel:
+        with self.session_factory() as db:
+            db.execute(update(SessionModel).where(SessionModel.session_id == session_obj.session_id).values(**values))
+            db.commit()
+        for key, value in values.items():
+            setattr(session_obj, key, value)
+        return session_obj
+
+    def delete(self, session_obj: SessionModel) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(SessionModel).where(SessionModel.session_id == session_obj.session_id))
+            db.commit()
+
+    def active_for_user(self, user_id: int) -> List[SessionModel]:
+        with self.session_factory() as db:
+            return get_active_sessions_for_user(db, user_id)
+
+
+class InMemorySessionStore(SessionStore):
+    # Process-local LRU with per-entry expiry. When full, expired sessions are
+    # purged first (via a heap ordered by expires_at) before any live session
+    # is evicted in LRU order. Used on its own it numbers sessions itself, so
+    # the ids only mean something within this process.
+
+    def __init__(self, maxsize: int = SESSION_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self._expiry_heap = []
+        self._tokens_by_user = {}
+        self._tokens_by_id = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, session_obj: SessionModel) -> None:
+        with self._lock:
+            previous = self._sessions.get(session_obj.token)
+            if previous is not None and previous is not session_obj:
+                self._remove(session_obj.token)
+            self._sessions[session_obj.token] = session_obj
+            self._sessions.move_to_end(session_obj.token)
+            heapq.heappush(self._expiry_heap, (session_obj.expires_at, session_obj.token))
+            self._tokens_by_user.setdefault(session_obj.user_id, set()).add(session_obj.token)
+            self._tokens_by_id[session_obj.session_id] = session_obj.token
+            if len(self._sessions) > self.maxsize:
+                self._purge_expired(datetime.utcnow())
+            while len(self._sessions) > self.maxsize:
+                oldest_token = next(iter(self._sessions))
+                self._remove(oldest_token)
+
+    def create(self, user_id: int, ip_address: str, device_info: str, token: Optional[str] = None,
+               expires_at: Optional[datetime] = None, session_id: Optional[int] = None) -> SessionModel:
+        if session_id is None:
+            session_id = next(self._ids)
+        session_obj = _new_session(user_id, ip_address, device_info, token, expires_at, session_id)
+        self.put(session_obj)
+        return session_obj
+
+    def get(self, token: str) -> Optional[SessionModel]:
+        with self._lock:
+            session_obj = self._sessions.get(token)
+            if session_obj is None:
+                return None
+            if session_obj.expires_at <= datetime.utcnow():
+                self._remove(token)
+                return None
+            self._sessions.move_to_end(token)
+            return session_obj
+
+    def get_by_id(self, session_id: int) -> Optional[SessionModel]:
+        with self._lock:
+            token = self._tokens_by_id.get(session_id)
+        return self.get(token) if token is not None else None
+
+    def update(self, session_obj: SessionModel, values: dict) -> SessionModel:
+        # Re-indexed as a whole since the token, owner or expiry may all change
+        with self._lock:
+            self._remove(session_obj.token)
+        for key, value in values.items():
+            setattr(session_obj, key, value)
+        self.put(session_obj)
+        return session_obj
+
+    def delete(self, session_obj: SessionModel) -> None:
+        with self._lock:
+            cached = self._sessions.get(session_obj.token)
+            # Another session may have been created with the same token since
+            if cached is not None and cached.session_id == session_obj.session_id:
+                self._remove(session_obj.token)
+
+    def active_for_user(self, user_id: int) -> List[SessionModel]:
+        now = datetime.utcnow()
+        with self._lock:
+            return [
+                self._sessions[token] for token in self._tokens_by_user.get(user_id, ())
+                if self._sessions[token].expires_at > now
+            ]
+
+    def _purge_expired(self, now: datetime) -> None:
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, token = heapq.heappop(self._expiry_heap)
+            session_obj = self._sessions.get(token)
+            # Skip heap entries left behind by deleted or re-added sessions
+            if session_obj is not None and session_obj.expires_at == expires_at:
+                self._remove(token)
+        # Deleted/evicted sessions leave stale heap entries; rebuild when they dominate
+        if len(self._expiry_heap) > 2 * len(self._sessions) + 1024:
+            self._expiry_heap = [(s.expires_at, t) for t, s in self._sessions.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _remove(self, token: str) -> Optional[SessionModel]:
+        session_obj = self._sessions.pop(token, None)
+        if session_obj is not None:
+            tokens = self._tokens_by_user.get(session_obj.user_id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[session_obj.user_id]
+            if self._tokens_by_id.get(session_obj.session_id) == token:
+                del self._tokens_by_id[session_obj.session_id]
+        return session_obj
+
+
+class WriteBehindSessionStore(SessionStore):
+    # Sessions are served from the in-memory LRU and persisted by a background
+    # thread in ordered batches. Lookups that miss (e.g. a token issued by another
+    # worker) fall through to Postgres and populate the cache. session_ids are
+    # reserved from the table's sequence in blocks, so a create can answer with
+    # its id before the row is written.
+
+    def __init__(self, session_factory=SessionLocal, maxsize: int = SESSION_CACHE_MAXSIZE):
+        self.cache = InMemorySessionStore(maxsize)
+        self.backing = PostgresSessionStore(session_factory)
+        self.session_factory = session_factory
+        self._pending = queue.Queue()
+        # Ops from a batch that failed to write; retried ahead of anything newer
+        self._retry = []
+        self._attempts = 0
+        # Keeps batches in order so an insert can't land after the delete that follows it
+        self._flush_lock = threading.Lock()
+        self._reserved_ids = deque()
+        self._highest_reserved = 0
+        self._id_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher = None
+
+    def start(self) -> None:
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run, name="session-write-behind", daemon=True)
+            self._flusher.start()
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            if not self._reserved_ids:
+                self._reserved_ids.extend(self._reserve_ids(SESSION_ID_BLOCK_SIZE))
+            return self._reserved_ids.popleft()
+
+    def _reserve_ids(self, count: int) -> List[int]:
+        with self.session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                return db.execute(text(
+                    "SELECT nextval(pg_get_serial_sequence('sessions', 'session_id')) FROM generate_series(1, :count)"
+                ), {"count": count}).scalars().all()
+            # No sequences (SQLite, local runs): continue above both the table and
+            # the ids this process has handed out but not written yet
+            highest = db.execute(select(func.max(SessionModel.session_id))).scalar() or 0
+        start = max(highest, self._highest_reserved) + 1
+        self._highest_reserved = start + count - 1
+        return list(range(start, start + count))
+
+    def create(self, user_id: int, ip_address: str, device_info: str, token: Optional[str] = None,
+               expires_at: Optional[datetime] = None) -> SessionModel:
+        session_obj = self.cache.create(user_id, ip_address, device_info, token, expires_at, self._next_id())
+        self._pending.put(("insert", _row(session_obj)))
+        return session_obj
+
+    def get(self, token: str) -> Optional[SessionModel]:
+        session_obj = self.cache.get(token)
+        if session_obj is None:
+            session_obj = self.backing.get(token)
+            if session_obj is not None:
+                self.cache.put(session_obj)
+        return session_obj
+
+    def get_by_id(self, session_id: int) -> Optional[SessionModel]:
+        session_obj = self.cache.get_by_id(session_id)
+        if session_obj is None:
+            session_obj = self.backing.get_by_id(session_id)
+            if session_obj is not None:
+                self.cache.put(session_obj)
+        return session_obj
+
+    def update(self, session_obj: SessionModel, values: dict) -> SessionModel:
+        self.cache.update(session_obj, values)
+        self._pending.put(("update", session_obj.session_id, dict(values)))
+        return session_obj
+
+    def delete(self, session_obj: SessionModel) -> None:
+        self.cache.delete(session_obj)
+        self._pending.put(("delete", session_obj.session_id))
+
+    def active_for_user(self, user_id: int) -> List[SessionModel]:
+        # Sessions can live on several workers, so ask the database once pending writes are out
+        self.flush()
+        return self.backing.active_for_user(user_id)
+
+    def flush(self) -> bool:
+        # Returns False when the batch could not be written and is kept for a retry
+        with self._flush_lock:
+            batch = self._retry
+            while len(batch) < SESSION_FLUSH_BATCH_SIZE:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return True
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._attempts += 1
+                if self._attempts < SESSION_FLUSH_MAX_ATTEMPTS:
+                    logger.error(f"Error flushing {len(batch)} session writes (attempt {self._attempts}), "
+                                 f"will retry: {str(e)}")
+                    self._retry = batch
+                    return False
+                logger.error(f"Error flushing {len(batch)} session writes, retrying them one at a time: {str(e)}")
+                self._write_individually(batch)
+            self._retry = []
+            self._attempts = 0
+            return True
+
+    def _write(self, batch) -> None:
+        # Ops are applied in queue order; runs of inserts go out as one executemany
+        with self.session_factory() as db:
+            inserts = []
+            for op in batch:
+                if op[0] == "insert":
+                    inserts.append(op[1])
+                    continue
+                if inserts:
+                    db.execute(insert(SessionModel), inserts)
+                    inserts = []
+                self._apply(db, op)
+            if inserts:
+                db.execute(insert(SessionModel), inserts)
+            db.commit()
+
+    def _write_individually(self, batch) -> None:
+        for op in batch:
+            try:
+                with self.session_factory() as db:
+                    if op[0] == "insert":
+                        db.execute(insert(SessionModel), [op[1]])
+                    else:
+                        self._apply(db, op)
+                    db.commit()
+            except Exception as e:
+                # Only an op the database rejects on its own is given up on
+                logger.error(f"Dropping session write {op[0]} for session {self._op_session_id(op)}: {str(e)}")
+
+    @staticmethod
+    def _apply(db, op) -> None:
+        if op[0] == "update":
+            db.execute(update(SessionModel).where(SessionModel.session_id == op[1]).values(**op[2]))
+        elif op[0] == "delete":
+            db.execute(delete(SessionModel).where(SessionModel.session_id == op[1]))
+
+    @staticmethod
+    def _op_session_id(op) -> int:
+        return op[1]["session_id"] if op[0] == "insert" else op[1]
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(SESSION_FLUSH_INTERVAL_SECONDS):
+            while not self._pending.empty() or self._retry:
+                if not self.flush():
+                    break
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        # Ends even if the database is down: after the last attempt flush() falls
+        # back to writing op by op and logs whatever still fails
+        while not self._pending.empty() or self._retry:
+            self.flush()
+
+
+def get_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "write_behind":
+        return WriteBehindSessionStore()
+    return PostgresSessionStore()
+
+
+session_store = get_session_store()
+
+
+def get_current_session(x_session_token: Optional[str] = Header(None)) -> SessionModel:
+    # The token-validation hot path: with the memory or write_behind backend a
+    # live session is answered from the LRU without touching the database
+    session_obj = session_store.get(x_session_token) if x_session_token else None
+    if session_obj is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired session")
+    return session_obj
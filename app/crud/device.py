@@ -1,16 +1,87 @@
+from sqlalchemy import exists, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from typing import List, Tuple
 from app.models.device import Device
+from app.models.user import User
+from app.models.subscription import Subscription
 from app.schemas.device import DeviceCreate
 
 def create_device(db: Session, device: DeviceCreate):
     db_device = Device(**device.dict())
     db.add(db_device)
     db.commit()
-    db.refresh(db_device)
     return db_device
 
 def get_device(db: Session, device_id: int):
     return db.query(Device).filter(Device.device_id == device_id).first()
 
 def get_devices_by_user(db: Session, user_id: int):
-    return db.query(Device).filter(Device.user_id == user_id).all()
\ No newline at end of file
+    return db.query(Device).filter(Device.user_id == user_id).all()
+
+def check_device_owner(db: Session, user_id: int) -> Tuple[bool, bool]:
+    # (user exists, user has an active subscription) in a single SELECT
+    row = db.execute(select(
+        exists().where(User.user_id == user_id),
+        exists().where(Subscription.user_id == user_id, Subscription.status == "active"),
+    )).one()
+    return bool(row[0]), bool(row[1])
+
+def bulk_create_devices(db: Session, rows: List[Tuple[int, DeviceCreate]], owner_errors: dict,
+                        known_subscriptions: dict):
+    # owner_errors caches user_id -> error message (or None when valid) and
+    # known_subscriptions subscription_id -> exists across batches, so each owner and
+    # subscription is checked at most once per upload with set-based queries
+    unchecked = {device.user_id for _, device in rows} - owner_errors.keys()
+    if unchecked:
+        has_subscription = exists().where(Subscription.user_id == User.user_id, Subscription.status == "active")
+        found = dict(db.execute(
+            select(User.user_id, has_subscription).where(User.user_id.in_(unchecked))
+        ).all())
+        for user_id in unchecked:
+            if user_id not in found:
+                owner_errors[user_id] = "User not found"
+            elif not found[user_id]:
+                owner_errors[user_id] = "User does not have an active subscription"
+            else:
+                owner_errors[user_id] = None
+    unchecked = {device.subscription_id for _, device in rows
+                 if device.subscription_id is not None} - known_subscriptions.keys()
+    if unchecked:
+        found = set(db.execute(
+            select(Subscription.subscription_id).where(Subscription.subscription_id.in_(unchecked))
+        ).scalars())
+        for subscription_id in unchecked:
+            known_subscriptions[subscription_id] = subscription_id in found
+
+    valid = []
+    errors = []
+    for row_number, device in rows:
+        error = owner_errors[device.user_id]
+        if error is None and device.subscription_id is not None and not known_subscriptions[device.subscription_id]:
+            error = "Subscription not found"
+        if error:
+            errors.append((row_number, error))
+        else:
+            valid.append((row_number, device.model_dump()))
+    if not valid:
+        return 0, errors
+    try:
+        # render_nulls keeps rows with and without a subscription_id in one INSERT
+        db.execute(insert(Device).execution_options(render_nulls=True), [values for _, values in valid])
+        db.commit()
+        return len(valid), errors
+    except IntegrityError:
+        # Something changed since the checks (e.g. a subscription was deleted):
+        # retry the batch row by row so only the offending rows fail
+        db.rollback()
+    inserted = 0
+    for row_number, values in valid:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Device), [values])
+            inserted += 1
+        except IntegrityError as e:
+            errors.append((row_number, f"Rejected by the database: {e.orig}"))
+    db.commit()
+    return inserted, errors
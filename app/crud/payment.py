@@ -6,7 +6,6 @@ def create_payment(db: Session, payment: PaymentCreate):
     db_payment = Payment(**payment.dict())
     db.add(db_payment)
     db.commit()
-    db.refresh(db_payment)
     return db_payment
 
 def get_payment(db: Session, payment_id: int):
@@ -6,7 +6,6 @@ def create_plan(db: Session, plan: PlanCreate):
     db_plan = Plan(**plan.dict())
     db.add(db_plan)
     db.commit()
-    db.refresh(db_plan)
     return db_plan
 
 def get_plan(db: Session, plan_id: int):
@@ -0,0 +1,150 @@
+from pydantic import TypeAdapter
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from typing import Dict, List
+import logging
+import os
+import select as select_module
+import threading
+import time
+from dotenv import load_dotenv
+from app.database.db import execute
+from app.database.pagination import encode_cursor
+from app.models.plan import Plan as PlanModel
+from app.schemas.plan import Plan
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Safety net in case a NOTIFY is missed (listener reconnecting, non-Postgres database)
+PLAN_CATALOG_MAX_AGE_SECONDS = float(os.getenv("PLAN_CATALOG_MAX_AGE_SECONDS", "60"))
+PLAN_CATALOG_CHANNEL = "plan_catalog"
+DEFAULT_PAGE_SIZE = 100
+
+plan_list_adapter = TypeAdapter(List[Plan])
+
+
+class PlanCatalogSnapshot:
+    def __init__(self, plans: List[Plan], versions: Dict[int, int]):
+        self.plans = plans
+        self.by_id = {plan.plan_id: plan for plan in plans}
+        # Row versions for ETags; not part of the Plan schema
+        self.versions = versions
+        self.loaded_at = time.monotonic()
+        # Pre-rendered body for the default GET /plans/ (active plans, first page)
+        default_page = [plan for plan in plans if plan.is_active][:DEFAULT_PAGE_SIZE]
+        self.default_response = plan_list_adapter.dump_json(default_page)
+        self.default_next_cursor = (
+            encode_cursor(default_page[-1].plan_id) if len(default_page) == DEFAULT_PAGE_SIZE else None
+        )
+
+
+class PlanCatalog:
+    # Every worker keeps the whole plan table in memory. Plan writes bump the
+    # generation locally and send a NOTIFY that the listener thread in every
+    # other worker turns into the same invalidation.
+
+    def __init__(self):
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.loaded_at > PLAN_CATALOG_MAX_AGE_SECONDS:
+            return None
+        return snapshot
+
+    def peek(self, plan_id: int):
+        # Cached lookup only; never touches the database
+        snapshot = self.current()
+        return snapshot.by_id.get(plan_id) if snapshot is not None else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _install(self, rows, generation: int) -> PlanCatalogSnapshot:
+        snapshot = PlanCatalogSnapshot([Plan.model_validate(row) for row in rows],
+                                       {row.plan_id: row.version for row in rows})
+        with self._lock:
+            # Don't overwrite an invalidation that happened while we were loading
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def snapshot_sync(self, db: Session) -> PlanCatalogSnapshot:
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot
+        generation = self._generation
+        rows = db.execute(select(PlanModel).order_by(PlanModel.plan_id)).scalars().all()
+        return self._install(rows, generation)
+
+    async def snapshot(self, db) -> PlanCatalogSnapshot:
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot
+        generation = self._generation
+        result = await execute(db, select(PlanModel).order_by(PlanModel.plan_id))
+        return self._install(result.scalars().all(), generation)
+
+
+plan_catalog = PlanCatalog()
+
+
+def notify_plan_change(db: Session) -> None:
+    # Queued in the write transaction; Postgres delivers it to listeners on commit
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": PLAN_CATALOG_CHANNEL})
+
+
+class PlanCatalogListener(threading.Thread):
+    def __init__(self, engine):
+        super().__init__(name="plan-catalog-listener", daemon=True)
+        self.engine = engine
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _connect(self):
+        # A dedicated connection outside the pool; LISTEN holds it for the worker's lifetime
+        cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+        conn = self.engine.dialect.connect(*cargs, **cparams)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {PLAN_CATALOG_CHANNEL}")
+        return conn
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                # Anything may have changed while we weren't listening
+                plan_catalog.invalidate()
+                while not self._stop_event.is_set():
+                    if select_module.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        plan_catalog.invalidate()
+            except Exception as e:
+                logger.error(f"Plan catalog listener error: {str(e)}")
+                self._stop_event.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def start_plan_catalog_listener(engine):
+    if engine.dialect.name != "postgresql":
+        logger.info("Plan catalog listener disabled; relying on PLAN_CATALOG_MAX_AGE_SECONDS")
+        return None
+    listener = PlanCatalogListener(engine)
+    listener.start()
+    return listener
@@ -6,7 +6,6 @@ def create_session(db: Session, session: SessionCreate):
     db_session = SessionModel(**session.dict())
     db.add(db_session)
     db.commit()
-    db.refresh(db_session)
     return db_session
 
 def get_session(db: Session, session_id: int):
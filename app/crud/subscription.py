@@ -1,13 +1,45 @@
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.models.subscription import Subscription
+from app.models.user import User
+from app.models.plan import Plan
+from app.models.payment import Payment
 from app.schemas.subscription import SubscriptionCreate
+from app.crud.plan_catalog import plan_catalog
 
 def create_subscription(db: Session, subscription: SubscriptionCreate):
     db_subscription = Subscription(**subscription.dict())
     db.add(db_subscription)
     db.commit()
-    db.refresh(db_subscription)
     return db_subscription
 
 def get_subscription(db: Session, subscription_id: int):
-    return db.query(Subscription).filter(Subscription.subscription_id == subscription_id).first()
\ No newline at end of file
+    return db.query(Subscription).filter(Subscription.subscription_id == subscription_id).first()
+
+def check_subscription_references(db: Session, user_id: Optional[int] = None, plan_id: Optional[int] = None,
+                                  payment_id: Optional[int] = None) -> dict:
+    # Existence of every referenced row in a single SELECT. Plans already in the
+    # catalog snapshot are answered from memory; ids left as None aren't checked.
+    refs = {"user": True, "plan": True, "payment": True, "plan_duration_days": None}
+    columns = []
+    if user_id is not None:
+        columns.append(exists().where(User.user_id == user_id).label("user"))
+    if plan_id is not None:
+        plan = plan_catalog.peek(plan_id)
+        if plan is not None:
+            refs["plan_duration_days"] = plan.duration_days
+        else:
+            columns.append(exists().where(Plan.plan_id == plan_id).label("plan"))
+            columns.append(
+                select(Plan.duration_days).where(Plan.plan_id == plan_id).scalar_subquery().label("plan_duration_days")
+            )
+    if payment_id is not None:
+        columns.append(exists().where(Payment.payment_id == payment_id).label("payment"))
+    if columns:
+        row = db.execute(select(*columns)).mappings().one()
+        refs.update(row)
+        if row.get("plan") and plan_catalog.current() is not None:
+            # Created by another worker whose NOTIFY hasn't reached us yet
+            plan_catalog.invalidate()
+    return refs
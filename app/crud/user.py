@@ -7,7 +7,6 @@ def create_user(db: Session, user: UserCreate):
     db_user = User(**user.dict())
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 
@@ -30,7 +29,6 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate):
     for key, value in user_update.dict(exclude_unset=True).items():
         setattr(db_user, key, value)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 
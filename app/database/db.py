@@ -1,19 +1,56 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.database.pool import engine_options
+from app.metrics import instrument_engine
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Serve read endpoints from an asyncpg-backed AsyncSession instead of the threadpool
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1) if DATABASE_URL else None
+)
+
+engine = create_engine(DATABASE_URL, **engine_options("DB", "main"))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
+# The async engine is only built when enabled so asyncpg stays optional for sync deployments
+async_engine = (
+    create_async_engine(ASYNC_DATABASE_URL, **engine_options("DB", "main_async", asynchronous=True))
+    if ASYNC_DB_ENABLED else None
+)
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if ASYNC_DB_ENABLED else None
+)
+
+instrument_engine(engine, "main")
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "main_async")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency used by read endpoints; picks the engine according to ASYNC_DB_ENABLED
+get_read_db = get_async_db if ASYNC_DB_ENABLED else get_db
+
+async def execute(db, statement):
+    if isinstance(db, AsyncSession):
+        return await db.execute(statement)
+    return await run_in_threadpool(db.execute, statement)
@@ -0,0 +1,32 @@
+from fastapi import Response
+from typing import Iterable, Optional, Tuple
+import hashlib
+
+# Rows carry a version column that every UPDATE bumps, so an ETag can be
+# derived from (primary key, version) without serializing the row.
+
+
+def row_etag(key: int, version: int) -> str:
+    return f'"{key}-{version}"'
+
+
+def collection_etag(versions: Iterable[Tuple[int, int]]) -> str:
+    # (primary key, version) pairs in key order; any insert, update or delete changes it
+    digest = hashlib.sha1()
+    for key, version in versions:
+        digest.update(f"{key}-{version};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix on either side is ignored
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
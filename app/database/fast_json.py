@@ -0,0 +1,35 @@
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from typing import List, Optional, Type
+import os
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # optional; list routes fall back to response_model serialization
+    orjson = None
+
+load_dotenv()
+
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "true").lower() == "true" and orjson is not None
+
+
+def row_columns(model, schema: Type[BaseModel]) -> List:
+    # The table columns behind each schema field, in schema order, so a Core
+    # select returns exactly what the response model would have exposed
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields]
+
+
+def rows_response(rows, response: Optional[Response] = None) -> ORJSONResponse:
+    # Result rows go straight to orjson: no ORM identity map and no per-row
+    # pydantic validation. Headers set on the injected response (e.g. the next
+    # cursor) are carried over since FastAPI only merges them for non-Response returns.
+    keys = rows[0]._fields if rows else ()
+    fast_response = ORJSONResponse([dict(zip(keys, row)) for row in rows])
+    if response is not None:
+        fast_response.raw_headers.extend(
+            (key, value) for key, value in response.raw_headers if key != b"content-length"
+        )
+    return fast_response
@@ -5,6 +5,7 @@ from app.models.plan import Plan
 from app.models.payment import Payment
 from app.models.subscription import Subscription
 from app.models.device import Device
+from app.models.payment_rollup import PaymentDailyRollup
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import text
+from app.database.session_db import engine
+
+# Optional: shared token buckets for login throttling across workers. Set
+# LOGIN_THROTTLE_BACKEND=postgres after running it. UNLOGGED because losing
+# the buckets on a crash only resets the limits.
+
+def upgrade():
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS login_throttle (
+                key VARCHAR(320) PRIMARY KEY,
+                tokens DOUBLE PRECISION NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+        print("Created login_throttle table")
+
+def downgrade():
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS login_throttle"))
+        print("Dropped login_throttle table")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import func, select
+from app.database.db import engine
+from app.database.payment_rollups import payment_date_range, rebuild_rollups
+from app.models.payment_rollup import PaymentDailyRollup
+
+# Daily revenue rollups behind GET /payments/analytics. The backfill only runs
+# while the table is empty; after that inline deltas and the refresher keep it current.
+
+def upgrade():
+    PaymentDailyRollup.__table__.create(bind=engine, checkfirst=True)
+    print("Created payment_daily_rollups table")
+    with engine.connect() as conn:
+        populated = conn.execute(select(func.count()).select_from(PaymentDailyRollup)).scalar()
+    covered = payment_date_range()
+    if populated or covered is None:
+        return
+    report = rebuild_rollups(*covered)
+    print(f"Backfilled {report['rollup_rows']} rollup rows in {report['seconds']}s")
+
+def downgrade():
+    PaymentDailyRollup.__table__.drop(bind=engine, checkfirst=True)
+    print("Dropped payment_daily_rollups table")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
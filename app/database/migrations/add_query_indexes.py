@@ -0,0 +1,39 @@
+from sqlalchemy import text
+from app.database.db import engine
+from app.database.session_db import engine as session_engine
+
+# (index name, table, columns) for the hot lookup paths in the routers
+MAIN_INDEXES = [
+    ("ix_devices_user_id", "devices", "user_id"),
+    ("ix_devices_imei_number", "devices", "imei_number"),
+    ("ix_subscriptions_user_id_status", "subscriptions", "user_id, status"),
+    ("ix_payments_user_id", "payments", "user_id"),
+    ("ix_payments_payment_date", "payments", "payment_date"),
+]
+
+SESSION_INDEXES = [
+    ("ix_sessions_token", "sessions", "token"),
+    ("ix_sessions_expires_at", "sessions", "expires_at"),
+    ("ix_sessions_user_id_expires_at", "sessions", "user_id, expires_at"),
+]
+
+def _create_indexes(target_engine, indexes):
+    # CONCURRENTLY can't run inside a transaction and avoids blocking writes on big tables
+    with target_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, table, columns in indexes:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+            print(f"Created index {name} on {table} ({columns})")
+
+def _drop_indexes(target_engine, indexes):
+    with target_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, table, columns in indexes:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            print(f"Dropped index {name}")
+
+def upgrade():
+    _create_indexes(engine, MAIN_INDEXES)
+    _create_indexes(session_engine, SESSION_INDEXES)
+
+def downgrade():
+    _drop_indexes(engine, MAIN_INDEXES)
+    _drop_indexes(session_engine, SESSION_INDEXES)
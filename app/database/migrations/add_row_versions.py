@@ -0,0 +1,20 @@
+from sqlalchemy import text
+from app.database.db import engine
+
+# Row version columns behind the ETags on conditional GETs
+VERSIONED_TABLES = ["devices", "subscriptions", "plans"]
+
+def upgrade():
+    with engine.connect() as conn:
+        for table in VERSIONED_TABLES:
+            # ADD COLUMN with a constant default doesn't rewrite the table on Postgres 11+
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+            print(f"Added version column to {table} table")
+        conn.commit()
+
+def downgrade():
+    with engine.connect() as conn:
+        for table in VERSIONED_TABLES:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS version"))
+            print(f"Dropped version column from {table} table")
+        conn.commit()
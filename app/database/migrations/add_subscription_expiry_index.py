@@ -0,0 +1,18 @@
+from sqlalchemy import text
+from app.database.db import engine
+
+# Partial index for the expiry sweeper: only active subscriptions, ordered by end_date
+
+def upgrade():
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subscriptions_active_end_date
+            ON subscriptions (end_date)
+            WHERE status = 'active'
+        """))
+        print("Created index ix_subscriptions_active_end_date")
+
+def downgrade():
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_subscriptions_active_end_date"))
+        print("Dropped index ix_subscriptions_active_end_date")
@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from app.database.session_db import engine
+from app.database.session_reaper import create_partition, SESSION_PARTITION_DAYS_AHEAD
+
+# Optional: converts sessions into a table range-partitioned by expires_at with one
+# partition per day, so the reaper can drop whole expired days instead of deleting
+# rows. Set SESSION_PARTITIONING=true after running it.
+
+def _is_partitioned(conn) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = 'sessions'
+    """)).first() is not None
+
+def upgrade():
+    with engine.begin() as conn:
+        if _is_partitioned(conn):
+            print("sessions is already partitioned")
+            return
+        conn.execute(text("ALTER TABLE sessions RENAME TO sessions_unpartitioned"))
+        conn.execute(text("ALTER TABLE sessions_unpartitioned RENAME CONSTRAINT sessions_pkey TO sessions_unpartitioned_pkey"))
+        for index in ("ix_sessions_token", "ix_sessions_expires_at", "ix_sessions_user_id_expires_at", "ix_sessions_session_id"):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        # The partition key has to be part of the primary key
+        conn.execute(text("""
+            CREATE TABLE sessions (
+                session_id INTEGER NOT NULL DEFAULT nextval('sessions_session_id_seq'),
+                user_id INTEGER,
+                token VARCHAR,
+                ip_address VARCHAR,
+                device_info VARCHAR,
+                expires_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (session_id, expires_at)
+            ) PARTITION BY RANGE (expires_at)
+        """))
+        conn.execute(text("ALTER SEQUENCE sessions_session_id_seq OWNED BY sessions.session_id"))
+        conn.execute(text("CREATE INDEX ix_sessions_token ON sessions (token)"))
+        conn.execute(text("CREATE INDEX ix_sessions_user_id_expires_at ON sessions (user_id, expires_at)"))
+        # Catches rows outside the pre-created days; the reaper still batch-deletes from it
+        conn.execute(text("CREATE TABLE sessions_default PARTITION OF sessions DEFAULT"))
+        today = datetime.utcnow().date()
+        for offset in range(SESSION_PARTITION_DAYS_AHEAD + 1):
+            create_partition(conn, today + timedelta(days=offset))
+        # Only live sessions are worth carrying over
+        conn.execute(text("""
+            INSERT INTO sessions (session_id, user_id, token, ip_address, device_info, expires_at, created_at)
+            SELECT session_id, user_id, token, ip_address, device_info, expires_at, created_at
+            FROM sessions_unpartitioned
+            WHERE expires_at >= :now
+        """), {"now": datetime.utcnow()})
+        conn.execute(text("DROP TABLE sessions_unpartitioned"))
+        print("Partitioned sessions table by expires_at")
+
+def downgrade():
+    with engine.begin() as conn:
+        if not _is_partitioned(conn):
+            print("sessions is not partitioned")
+            return
+        conn.execute(text("ALTER TABLE sessions RENAME TO sessions_partitioned"))
+        conn.execute(text("ALTER TABLE sessions_partitioned RENAME CONSTRAINT sessions_pkey TO sessions_partitioned_pkey"))
+        conn.execute(text("""
+            CREATE TABLE sessions (
+                session_id INTEGER NOT NULL DEFAULT nextval('sessions_session_id_seq') PRIMARY KEY,
+                user_id INTEGER,
+                token VARCHAR,
+                ip_address VARCHAR,
+                device_info VARCHAR,
+                expires_at TIMESTAMP,
+                created_at TIMESTAMP
+            )
+        """))
+        conn.execute(text("ALTER SEQUENCE sessions_session_id_seq OWNED BY sessions.session_id"))
+        conn.execute(text("INSERT INTO sessions SELECT * FROM sessions_partitioned"))
+        conn.execute(text("DROP TABLE sessions_partitioned"))
+        conn.execute(text("CREATE INDEX ix_sessions_session_id ON sessions (session_id)"))
+        conn.execute(text("CREATE INDEX ix_sessions_token ON sessions (token)"))
+        conn.execute(text("CREATE INDEX ix_sessions_expires_at ON sessions (expires_at)"))
+        conn.execute(text("CREATE INDEX ix_sessions_user_id_expires_at ON sessions (user_id, expires_at)"))
+        print("Converted sessions back to a regular table")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -3,15 +3,31 @@ import os
 from pathlib import Path
 
 # Add the project root to the Python path
-project_root = str(Path(__file__).parent.parent.parent)
+project_root = str(Path(__file__).parent.parent.parent.parent)
 sys.path.append(project_root)
 
-from app.database.migrations.add_password_hash import upgrade, downgrade
+from app.database.init_db import init_db
+from app.database.init_session_db import init_session_db
+from app.database.migrations import (
+    add_password_hash, add_query_indexes, add_subscription_expiry_index, add_row_versions, add_payment_rollups,
+    add_login_throttle
+)
+
+MIGRATIONS = [
+    add_password_hash, add_query_indexes, add_subscription_expiry_index, add_row_versions, add_payment_rollups,
+    add_login_throttle
+]
+# Opt-in, run by hand: partition_sessions.py rewrites the sessions table, then set
+# SESSION_PARTITIONING=true. Startup refuses that setting until it has been applied.
 
 def run_migrations():
     try:
+        print("Creating database schemas...")
+        init_db()
+        init_session_db()
         print("Starting database migrations...")
-        upgrade()
+        for migration in MIGRATIONS:
+            migration.upgrade()
         print("Migrations completed successfully!")
     except Exception as e:
         print(f"Error running migrations: {str(e)}")
@@ -0,0 +1,151 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import Date, DateTime, bindparam, text
+from datetime import date, datetime, timedelta
+import argparse
+import json
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from app.database.db import engine
+from app.database.periodic import PeriodicWorker, start_periodic_worker
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Apply each payment write to its rollup row in the same transaction. Turn off to
+# leave the rollups to the refresher alone, e.g. if today's rows become too hot.
+PAYMENT_ROLLUP_INLINE = os.getenv("PAYMENT_ROLLUP_INLINE", "true").lower() == "true"
+PAYMENT_ROLLUP_REFRESH_ENABLED = os.getenv("PAYMENT_ROLLUP_REFRESH_ENABLED", "false").lower() == "true"
+PAYMENT_ROLLUP_REFRESH_INTERVAL_SECONDS = float(os.getenv("PAYMENT_ROLLUP_REFRESH_INTERVAL_SECONDS", "300"))
+# Trailing days the refresher recomputes each pass, today included
+PAYMENT_ROLLUP_REFRESH_DAYS = int(os.getenv("PAYMENT_ROLLUP_REFRESH_DAYS", "2"))
+# Days recomputed per transaction by a rebuild, so a backfill never holds one huge one
+PAYMENT_ROLLUP_REBUILD_BATCH_DAYS = int(os.getenv("PAYMENT_ROLLUP_REBUILD_BATCH_DAYS", "31"))
+
+# ON CONFLICT upserts read the same on Postgres and SQLite
+APPLY_DELTA = text("""
+    INSERT INTO payment_daily_rollups (day, plan_id, status, payment_count, amount_total)
+    VALUES (:day, :plan_id, :status, :payment_count, :amount_total)
+    ON CONFLICT (day, plan_id, status) DO UPDATE SET
+        payment_count = payment_daily_rollups.payment_count + excluded.payment_count,
+        amount_total = payment_daily_rollups.amount_total + excluded.amount_total
+""").bindparams(bindparam("day", type_=Date))
+
+CLEAR_DAYS = text("""
+    DELETE FROM payment_daily_rollups WHERE day >= :start_day AND day < :end_day
+""").bindparams(bindparam("start_day", type_=Date), bindparam("end_day", type_=Date))
+
+# Sets totals rather than adding to them, so an inline delta that lands between the
+# DELETE and this statement isn't counted twice. A payment committed while the
+# statement runs can still be missed; the refresher's next pass picks it up.
+REBUILD_DAYS = text("""
+    INSERT INTO payment_daily_rollups (day, plan_id, status, payment_count, amount_total)
+    SELECT date(payment_date), plan_id, status, count(*), sum(amount)
+    FROM payments
+    WHERE payment_date >= :start_at AND payment_date < :end_at
+    GROUP BY date(payment_date), plan_id, status
+    ON CONFLICT (day, plan_id, status) DO UPDATE SET
+        payment_count = excluded.payment_count,
+        amount_total = excluded.amount_total
+""").bindparams(bindparam("start_at", type_=DateTime), bindparam("end_at", type_=DateTime))
+
+
+def rollup_key(payment) -> tuple:
+    return (payment.payment_date.date(), payment.plan_id, payment.status)
+
+
+def apply_payment_delta(db, key: tuple, count: int, amount: float) -> None:
+    # Runs in the caller's session, so the rollup commits or rolls back with the payment
+    if not PAYMENT_ROLLUP_INLINE:
+        return
+    day, plan_id, status = key
+    db.execute(APPLY_DELTA, {
+        "day": day, "plan_id": plan_id, "status": status, "payment_count": count, "amount_total": amount,
+    })
+
+
+def apply_payment_change(db, old_key: tuple, old_amount: float, new_key: tuple, new_amount: float) -> None:
+    if old_key == new_key:
+        if old_amount != new_amount:
+            apply_payment_delta(db, new_key, 0, new_amount - old_amount)
+        return
+    apply_payment_delta(db, old_key, -1, -old_amount)
+    apply_payment_delta(db, new_key, 1, new_amount)
+
+
+def rebuild_rollups(start_day: date, end_day: date, target_engine=engine,
+                    batch_days: int = PAYMENT_ROLLUP_REBUILD_BATCH_DAYS) -> dict:
+    # Recomputes [start_day, end_day) from payments. Also corrects drift from writes
+    # that bypass the API: bulk loads, manual SQL, payments removed by a cascade.
+    start = time.perf_counter()
+    rows = 0
+    day = start_day
+    while day < end_day:
+        batch_end = min(day + timedelta(days=batch_days), end_day)
+        with target_engine.begin() as conn:
+            conn.execute(CLEAR_DAYS, {"start_day": day, "end_day": batch_end})
+            rows += conn.execute(REBUILD_DAYS, {
+                "start_at": datetime.combine(day, datetime.min.time()),
+                "end_at": datetime.combine(batch_end, datetime.min.time()),
+            }).rowcount
+        day = batch_end
+    report = {
+        "start_day": start_day.isoformat(),
+        "end_day": end_day.isoformat(),
+        "rollup_rows": rows,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logger.info(f"Rebuilt {rows} payment rollup rows for {start_day} to {end_day} ({report['seconds']}s)")
+    return report
+
+
+def payment_date_range(target_engine=engine):
+    # (first day, day after the last) covered by payments, or None when there are none
+    with target_engine.connect() as conn:
+        first, last = conn.execute(text("SELECT min(payment_date), max(payment_date) FROM payments")).one()
+    if first is None:
+        return None
+    # SQLite hands back strings here
+    if isinstance(first, str):
+        first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+    return first.date(), last.date() + timedelta(days=1)
+
+
+class PaymentRollupRefresher(PeriodicWorker):
+    def __init__(self, target_engine=engine, interval: float = PAYMENT_ROLLUP_REFRESH_INTERVAL_SECONDS,
+                 days: int = PAYMENT_ROLLUP_REFRESH_DAYS):
+        super().__init__("payment-rollup-refresher", interval)
+        self.target_engine = target_engine
+        self.days = days
+
+    def run_once(self) -> None:
+        # payment_date is stored in UTC, so the rollup days are UTC days
+        end_day = datetime.utcnow().date() + timedelta(days=1)
+        rebuild_rollups(end_day - timedelta(days=self.days), end_day, self.target_engine)
+
+
+def start_payment_rollup_refresher():
+    return start_periodic_worker(PAYMENT_ROLLUP_REFRESH_ENABLED, PaymentRollupRefresher)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recompute daily payment rollups from the payments table")
+    parser.add_argument("--start", type=date.fromisoformat, default=None,
+                        help="first day to rebuild (default: the earliest payment)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None,
+                        help="day after the last one to rebuild (default: the day after the latest payment)")
+    args = parser.parse_args()
+    covered = payment_date_range()
+    if covered is None and (args.start is None or args.end is None):
+        print(json.dumps({"rollup_rows": 0, "reason": "no payments"}))
+    else:
+        print(json.dumps(rebuild_rollups(args.start or covered[0], args.end or covered[1])))
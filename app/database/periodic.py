@@ -0,0 +1,40 @@
+from abc import ABC, abstractmethod
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker(threading.Thread, ABC):
+    # Background loop shared by the maintenance jobs: calls run_once() every
+    # interval seconds until stop(). A failed pass is logged and the next one
+    # still runs on schedule.
+
+    def __init__(self, name: str, interval: float):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    @abstractmethod
+    def run_once(self) -> None:
+        ...
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in {self.name}: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+
+def start_periodic_worker(enabled: bool, worker_factory):
+    # The start_* helpers main.py calls: None when the worker is switched off
+    if not enabled:
+        return None
+    worker = worker_factory()
+    worker.start()
+    return worker
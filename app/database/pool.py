@@ -0,0 +1,147 @@
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.peak_in_use = 0
+        self.wait_count = 0
+        self.wait_total_seconds = 0.0
+        self.wait_max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_seconds += seconds
+            if seconds > self.wait_max_seconds:
+                self.wait_max_seconds = seconds
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            avg_wait = self.wait_total_seconds / self.wait_count if self.wait_count else 0.0
+            return {
+                "pool_size": pool.size() if pool else None,
+                "in_use": pool.checkedout() if pool else None,
+                "idle": pool.checkedin() if pool else None,
+                "overflow": pool.overflow() if pool else None,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "checkout_wait_avg_ms": avg_wait * 1000,
+                "checkout_wait_max_ms": self.wait_max_seconds * 1000,
+                "checkout_wait_total_ms": self.wait_total_seconds * 1000,
+            }
+
+
+# Metrics for every instrumented engine, keyed by name ("main", "session", ...)
+pool_metrics = {}
+
+
+def _instrumented_pool_class(base, metrics: PoolMetrics):
+    def on_connect(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.connects += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrics._lock:
+            metrics.checkouts += 1
+            in_use = metrics.pool.checkedout() if metrics.pool else 0
+            if in_use > metrics.peak_in_use:
+                metrics.peak_in_use = in_use
+
+    def on_checkin(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.checkins += 1
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics._lock:
+            metrics.invalidations += 1
+
+    listeners = {
+        "connect": on_connect,
+        "checkout": on_checkout,
+        "checkin": on_checkin,
+        "invalidate": on_invalidate,
+    }
+
+    # Pool has no "before checkout" event, so the wait is timed around _do_get.
+    # recreate() (e.g. after dispose) reuses self.__class__ and copies the
+    # dispatch, so listeners are only attached once.
+    class InstrumentedPool(base):
+        # Keep the pool's logger under the "sqlalchemy" namespace so it stays quiet unless echo_pool is set
+        __module__ = base.__module__
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            metrics.pool = self
+            for identifier, fn in listeners.items():
+                if not event.contains(self, identifier, fn):
+                    event.listen(self, identifier, fn)
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.observe_wait(time.perf_counter() - start)
+
+    return InstrumentedPool
+
+
+def engine_options(env_prefix: str, name: str, asynchronous: bool = False) -> dict:
+    # Pool settings come from <PREFIX>_POOL_* environment variables
+    metrics = pool_metrics.setdefault(name, PoolMetrics(name))
+    base = AsyncAdaptedQueuePool if asynchronous else QueuePool
+    return {
+        "poolclass": _instrumented_pool_class(base, metrics),
+        "pool_size": int(os.getenv(f"{env_prefix}_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv(f"{env_prefix}_POOL_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv(f"{env_prefix}_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv(f"{env_prefix}_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv(f"{env_prefix}_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+
+def _warm_up_count(engine, env_prefix: str) -> int:
+    return int(os.getenv(f"{env_prefix}_POOL_WARMUP", str(engine.pool.size())))
+
+
+def warm_up(engine, env_prefix: str) -> None:
+    # Open connections before serving so the first requests skip the connect handshake
+    opened = []
+    try:
+        for _ in range(_warm_up_count(engine, env_prefix)):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+async def warm_up_async(async_engine, env_prefix: str) -> None:
+    opened = []
+    try:
+        for _ in range(_warm_up_count(async_engine.sync_engine, env_prefix)):
+            conn = await async_engine.connect()
+            opened.append(conn)
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            await conn.close()
@@ -1,20 +1,42 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from app.database.db import ASYNC_DB_ENABLED
+from app.database.pool import engine_options
+from app.metrics import instrument_engine
 
 # Load environment variables from .env
 load_dotenv()
 
 # Get DB URL from environment variable
 SESSION_DATABASE_URL = os.getenv("SESSION_DATABASE_URL")
+ASYNC_SESSION_DATABASE_URL = os.getenv(
+    "ASYNC_SESSION_DATABASE_URL",
+    SESSION_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1) if SESSION_DATABASE_URL else None
+)
 
 # SQLAlchemy setup
-engine = create_engine(SESSION_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(SESSION_DATABASE_URL, **engine_options("SESSION_DB", "session"))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
+# Async engine, only built when ASYNC_DB_ENABLED is set
+async_engine = (
+    create_async_engine(ASYNC_SESSION_DATABASE_URL, **engine_options("SESSION_DB", "session_async", asynchronous=True))
+    if ASYNC_DB_ENABLED else None
+)
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if ASYNC_DB_ENABLED else None
+)
+
+instrument_engine(engine, "session")
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "session_async")
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -22,3 +44,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
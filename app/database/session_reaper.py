@@ -0,0 +1,166 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import inspect, text
+from datetime import datetime, timedelta
+import argparse
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from app.database.session_db import engine
+from app.database.periodic import PeriodicWorker, start_periodic_worker
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SESSION_REAPER_ENABLED = os.getenv("SESSION_REAPER_ENABLED", "false").lower() == "true"
+SESSION_REAPER_INTERVAL_SECONDS = float(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "300"))
+SESSION_REAPER_BATCH_SIZE = int(os.getenv("SESSION_REAPER_BATCH_SIZE", "5000"))
+# Pause between batches so the reaper never monopolises the session database
+SESSION_REAPER_BATCH_PAUSE_SECONDS = float(os.getenv("SESSION_REAPER_BATCH_PAUSE_SECONDS", "0.05"))
+# Set once app/database/migrations/partition_sessions.py has been applied
+SESSION_PARTITIONING = os.getenv("SESSION_PARTITIONING", "false").lower() == "true"
+SESSION_PARTITION_DAYS_AHEAD = int(os.getenv("SESSION_PARTITION_DAYS_AHEAD", "7"))
+
+PARTITION_PREFIX = "sessions_p"
+
+DELETE_EXPIRED_BATCH = text("""
+    DELETE FROM sessions
+    WHERE (session_id, expires_at) IN (
+        SELECT session_id, expires_at FROM sessions
+        WHERE expires_at < :now
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+
+def partition_name(day) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def create_partition(conn, day) -> None:
+    name = partition_name(day)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    start = datetime(day.year, day.month, day.day)
+    end = start + timedelta(days=1)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    # Sessions expiring past the pre-created window land in sessions_default, and
+    # Postgres refuses a new partition while the default holds rows in its range.
+    # Move them across: detach the default, create the partition, re-insert the
+    # rows through the parent and re-attach. Runs in the caller's transaction.
+    in_default = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM sessions_default WHERE expires_at >= :start AND expires_at < :end)"
+    ), {"start": start, "end": end}).scalar()
+    if not in_default:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF sessions {bounds}"))
+        return
+    conn.execute(text("ALTER TABLE sessions DETACH PARTITION sessions_default"))
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF sessions {bounds}"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM sessions_default WHERE expires_at >= :start AND expires_at < :end
+            RETURNING session_id, user_id, token, ip_address, device_info, expires_at, created_at
+        )
+        INSERT INTO {name} (session_id, user_id, token, ip_address, device_info, expires_at, created_at)
+        SELECT * FROM moved
+    """), {"start": start, "end": end}).rowcount
+    conn.execute(text("ALTER TABLE sessions ATTACH PARTITION sessions_default DEFAULT"))
+    logger.info(f"Moved {moved} sessions from sessions_default into {name}")
+
+
+def verify_partitioning(target_engine=engine) -> None:
+    # Called at startup: partition upkeep assumes partition_sessions.py has been applied
+    if not SESSION_PARTITIONING:
+        return
+    if not inspect(target_engine).has_table("sessions_default"):
+        raise RuntimeError(
+            "SESSION_PARTITIONING=true but sessions is not partitioned; "
+            "run app/database/migrations/partition_sessions.py first"
+        )
+
+
+def maintain_partitions(target_engine=engine) -> int:
+    # Creates the daily partitions ahead of time and drops every partition whose
+    # whole range has expired; dropping a partition is a metadata change, not a scan
+    today = datetime.utcnow().date()
+    dropped = 0
+    with target_engine.begin() as conn:
+        for offset in range(SESSION_PARTITION_DAYS_AHEAD + 1):
+            create_partition(conn, today + timedelta(days=offset))
+        partitions = conn.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'sessions'
+        """)).scalars().all()
+    for name in sorted(partitions):
+        if not name.startswith(PARTITION_PREFIX) or name >= partition_name(today):
+            continue
+        with target_engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE sessions DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped += 1
+        logger.info(f"Dropped expired session partition {name}")
+    return dropped
+
+
+def reap_expired_sessions(target_engine=engine, batch_size: int = SESSION_REAPER_BATCH_SIZE) -> int:
+    # Each batch is its own short transaction; SKIP LOCKED lets concurrent reapers
+    # (or other workers) share the work without waiting on each other's row locks
+    total = 0
+    now = datetime.utcnow()
+    while True:
+        with target_engine.begin() as conn:
+            deleted = conn.execute(DELETE_EXPIRED_BATCH, {"now": now, "batch_size": batch_size}).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(SESSION_REAPER_BATCH_PAUSE_SECONDS)
+
+
+def run_once(target_engine=engine) -> int:
+    start = time.perf_counter()
+    if SESSION_PARTITIONING:
+        # A partition problem must not stop expired sessions from being reaped
+        try:
+            maintain_partitions(target_engine)
+        except Exception as e:
+            logger.error(f"Error maintaining session partitions: {str(e)}")
+    deleted = reap_expired_sessions(target_engine)
+    logger.info(f"Reaped {deleted} expired sessions in {time.perf_counter() - start:.2f}s")
+    return deleted
+
+
+class SessionReaper(PeriodicWorker):
+    def __init__(self, target_engine=engine, interval: float = SESSION_REAPER_INTERVAL_SECONDS):
+        super().__init__("session-reaper", interval)
+        self.target_engine = target_engine
+
+    def run_once(self) -> None:
+        run_once(self.target_engine)
+
+
+def start_session_reaper():
+    return start_periodic_worker(SESSION_REAPER_ENABLED, SessionReaper)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Delete expired sessions from the session database")
+    parser.add_argument("--loop", action="store_true", help="keep running every SESSION_REAPER_INTERVAL_SECONDS")
+    args = parser.parse_args()
+    if args.loop:
+        while True:
+            run_once()
+            time.sleep(SESSION_REAPER_INTERVAL_SECONDS)
+    else:
+        run_once()
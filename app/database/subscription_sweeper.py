@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from sqlalchemy import text
+from datetime import date
+import argparse
+import json
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from app.database.db import engine
+from app.database.periodic import PeriodicWorker, start_periodic_worker
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_SWEEPER_ENABLED = os.getenv("SUBSCRIPTION_SWEEPER_ENABLED", "false").lower() == "true"
+SUBSCRIPTION_SWEEPER_INTERVAL_SECONDS = float(os.getenv("SUBSCRIPTION_SWEEPER_INTERVAL_SECONDS", "3600"))
+SUBSCRIPTION_SWEEPER_BATCH_SIZE = int(os.getenv("SUBSCRIPTION_SWEEPER_BATCH_SIZE", "5000"))
+SUBSCRIPTION_SWEEPER_BATCH_PAUSE_SECONDS = float(os.getenv("SUBSCRIPTION_SWEEPER_BATCH_PAUSE_SECONDS", "0.05"))
+
+# SKIP LOCKED lets sweepers on several nodes split the work; re-checking status in
+# the outer WHERE keeps a row from being transitioned twice
+EXPIRE_BATCH = text("""
+    UPDATE subscriptions
+    SET status = 'expired', version = version + 1
+    WHERE subscription_id IN (
+        SELECT subscription_id FROM subscriptions
+        WHERE status = 'active' AND end_date < :today
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    AND status = 'active'
+""")
+
+
+def expire_subscriptions(target_engine=engine, today: date = None,
+                         batch_size: int = SUBSCRIPTION_SWEEPER_BATCH_SIZE) -> dict:
+    today = today or date.today()
+    start = time.perf_counter()
+    expired = 0
+    batches = 0
+    while True:
+        with target_engine.begin() as conn:
+            updated = conn.execute(EXPIRE_BATCH, {"today": today, "batch_size": batch_size}).rowcount
+        batches += 1
+        expired += updated
+        if updated < batch_size:
+            break
+        time.sleep(SUBSCRIPTION_SWEEPER_BATCH_PAUSE_SECONDS)
+    report = {
+        "expired": expired,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - start, 3),
+        "cutoff": today.isoformat(),
+    }
+    logger.info(f"Expired {expired} subscriptions in {batches} batches ({report['seconds']}s)")
+    return report
+
+
+class SubscriptionSweeper(PeriodicWorker):
+    def __init__(self, target_engine=engine, interval: float = SUBSCRIPTION_SWEEPER_INTERVAL_SECONDS):
+        super().__init__("subscription-sweeper", interval)
+        self.target_engine = target_engine
+
+    def run_once(self) -> None:
+        expire_subscriptions(self.target_engine)
+
+
+def start_subscription_sweeper():
+    return start_periodic_worker(SUBSCRIPTION_SWEEPER_ENABLED, SubscriptionSweeper)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Transition active subscriptions past their end_date to expired")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="expire subscriptions ending before this date (default: today)")
+    args = parser.parse_args()
+    print(json.dumps(expire_subscriptions(today=args.as_of)))
@@ -0,0 +1,243 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json (one object per line) or text (basicConfig-style lines, for local runs)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Records waiting for the writer thread; past this they are dropped and counted
+# rather than making a request wait on stderr
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of INFO-and-below records kept per logger, e.g.
+# "app.routers.device=0.01,app.routers.subscription=0.05". The longest matching
+# logger prefix wins; warnings and errors are always kept.
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+REQUEST_ID_HEADER = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+
+# Set per request by RequestIdMiddleware; the threadpool copies the context, so
+# sync handlers log with the right id too
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+# LogRecord attributes that aren't user-supplied extra fields; uvicorn's
+# color_message is its message again with terminal escapes
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "request_id", "color_message"}
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    # Decides per request rather than per record, so a sampled request keeps all
+    # of its lines from a given logger and an unsampled one drops them all
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first so "app.routers.device" beats "app.routers"
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._cache: Dict[str, float] = {}
+        self._counter = 0
+
+    def rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = next((r for prefix, r in self.rates if name == prefix or name.startswith(prefix + ".")), 1.0)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            bucket = zlib.crc32(request_id.encode())
+        else:
+            # Outside a request; races between threads only skew which record is kept
+            self._counter += 1
+            bucket = zlib.crc32(self._counter.to_bytes(8, "little"))
+        return bucket % 10000 < rate * 10000
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Only the %-args merge runs on the calling thread; JSON encoding and the
+    # write happen on the listener thread. A full queue drops the record.
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that could change or go stale before the writer gets to it
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait(record)
+
+
+class RequestIdFilter(logging.Filter):
+    # Added to the handler ahead of SamplingFilter, which samples by this id
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        # Fields passed with extra={...} go out as-is
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# uvicorn gives these their own stream handlers with propagate=False; configure()
+# hands them back to the root logger so server and access lines take the queue too
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+class LoggingPipeline:
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.stream_handler: Optional[logging.Handler] = None
+        self.listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def configure(self) -> None:
+        # Safe to call repeatedly: at import and again at every lifespan startup, so
+        # the writer thread comes back after a previous lifespan's stop(). Records
+        # queued while it was stopped are written once it restarts.
+        with self._lock:
+            if self.handler is None:
+                self.stream_handler = logging.StreamHandler(sys.stderr)
+                if LOG_FORMAT == "json":
+                    self.stream_handler.setFormatter(JsonFormatter())
+                else:
+                    self.stream_handler.setFormatter(
+                        logging.Formatter("%(levelname)s:%(name)s:%(request_id)s:%(message)s"))
+                self.handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+                self.handler.addFilter(RequestIdFilter())
+                rates = parse_sample_rates(LOG_SAMPLE_RATES)
+                if rates:
+                    self.handler.addFilter(SamplingFilter(rates))
+                atexit.register(self._flush_at_exit)
+            root = logging.getLogger()
+            root.handlers = [self.handler]
+            root.setLevel(LOG_LEVEL)
+            for name in UVICORN_LOGGERS:
+                uvicorn_logger = logging.getLogger(name)
+                uvicorn_logger.handlers = []
+                uvicorn_logger.propagate = True
+            if self.listener is None:
+                self.listener = QueueListener(self.handler.queue, self.stream_handler, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self) -> None:
+        # Drains whatever is still queued, then joins the writer thread. The queue
+        # handler stays installed; configure() starts a new writer.
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def _flush_at_exit(self) -> None:
+        # Scripts that never ran the lifespan, and the lines uvicorn logs after the
+        # lifespan's stop(), are still written before the process exits
+        with self._lock:
+            if self.listener is None and self.handler is not None and not self.handler.queue.empty():
+                self.listener = QueueListener(self.handler.queue, self.stream_handler, respect_handler_level=True)
+                self.listener.start()
+        self.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "max_queue": LOG_QUEUE_SIZE,
+            "dropped": self.handler.dropped if self.handler else 0,
+        }
+
+
+logging_pipeline = LoggingPipeline()
+
+
+class RequestIdMiddleware:
+    # Takes the caller's X-Request-ID when given (so ids follow a request across
+    # services) or makes one, exposes it to log records and echoes it back
+
+    def __init__(self, app):
+        self.app = app
+        self.header = REQUEST_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                # Bounded so a client can't stuff arbitrary data into every log line
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        token = current_request_id.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_id.reset(token)
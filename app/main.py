@@ -1,21 +1,31 @@
 from fastapi import FastAPI
 from fastapi.security import HTTPBasic
-from app.routers import user, device, subscription, plan, payment, session
-from app.database.db import Base, engine
-from app.database.session_db import Base as SessionBase, engine as session_engine
+from app.routers import user, device, subscription, plan, payment, session, internal, metrics
+from app.database.db import Base, engine, async_engine
+from app.database.session_db import Base as SessionBase, engine as session_engine, async_engine as session_async_engine
 from app.models.user import User
 from app.models.plan import Plan
 from app.models.payment import Payment
 from app.models.subscription import Subscription
 from app.models.device import Device
 from app.models.session import Session
+from app.database.pool import warm_up, warm_up_async
+from app.database.db import SessionLocal
+from app.crud.plan_catalog import plan_catalog, start_plan_catalog_listener
+from app.auth.session import session_store
+from app.auth.hashing import password_hasher
+from app.auth.login_throttle import login_throttle
+from app.metrics import MetricsMiddleware
+from app.logging_config import RequestIdMiddleware, logging_pipeline
+from app.database.session_reaper import start_session_reaper, verify_partitioning
+from app.database.subscription_sweeper import start_subscription_sweeper
+from app.database.payment_rollups import start_payment_rollup_refresher
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import logging
-from app.database.init_db import init_db
-from app.database.init_session_db import init_session_db
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records go through a queue to a writer thread as JSON lines
+logging_pipeline.configure()
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env
@@ -24,13 +34,52 @@ load_dotenv()
 # Create security scheme
 security = HTTPBasic()
 
-# Initialize databases
-logger.info("Initializing databases...")
-init_db()
-init_session_db()
-logger.info("Database initialization completed")
+# Schema creation is an explicit step (python app/database/migrations/run_migrations.py);
+# workers only warm their connection pools on startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Restarts the log writer if an earlier lifespan (another server or TestClient) stopped it
+    logging_pipeline.configure()
+    logger.info("Warming up connection pools...")
+    warm_up(engine, "DB")
+    warm_up(session_engine, "SESSION_DB")
+    if async_engine is not None:
+        await warm_up_async(async_engine, "DB")
+        await warm_up_async(session_async_engine, "SESSION_DB")
+    logger.info("Connection pools ready")
+    # Opt-in features whose tables come from a migration: fail here, not per request
+    login_throttle.verify_backend()
+    verify_partitioning()
+    plan_listener = start_plan_catalog_listener(engine)
+    with SessionLocal() as db:
+        plan_catalog.snapshot_sync(db)
+    logger.info("Plan catalog loaded")
+    # Starts the write-behind flusher when that backend is configured
+    session_store.start()
+    session_reaper = start_session_reaper()
+    subscription_sweeper = start_subscription_sweeper()
+    payment_rollup_refresher = start_payment_rollup_refresher()
+    yield
+    if session_reaper is not None:
+        session_reaper.stop()
+    if subscription_sweeper is not None:
+        subscription_sweeper.stop()
+    if payment_rollup_refresher is not None:
+        payment_rollup_refresher.stop()
+    if plan_listener is not None:
+        plan_listener.stop()
+    # Flushes any sessions still queued by the write-behind store
+    session_store.close()
+    password_hasher.shutdown()
+    engine.dispose()
+    session_engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+        await session_async_engine.dispose()
+    logging_pipeline.stop()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Subscription and Device Management API",
     version="1.0.0",
     description="Backend system to manage users, subscriptions, devices, sessions, and payments.",
@@ -40,6 +89,10 @@ app = FastAPI(
     swagger_ui_parameters={"defaultModelsExpandDepth": -1}
 )
 
+app.add_middleware(MetricsMiddleware)
+# Added last so it wraps everything else, including the metrics middleware's own logging
+app.add_middleware(RequestIdMiddleware)
+
 # Include Routers
 logger.info("Registering routers...")
 app.include_router(user.router, prefix="/users", tags=["Users"])
@@ -48,4 +101,6 @@ app.include_router(subscription.router, prefix="/subscriptions", tags=["Subscrip
 app.include_router(plan.router, prefix="/plans", tags=["Plans"])
 app.include_router(payment.router, prefix="/payments", tags=["Payments"])
 app.include_router(session.router, prefix="/sessions", tags=["Sessions"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"], include_in_schema=False)
+app.include_router(metrics.router, include_in_schema=False)
 logger.info("All routers registered")
@@ -0,0 +1,193 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def query_budget(max_queries: int):
+    # Declares how many SQL statements an endpoint may issue per request. Goes
+    # under the @router decorator; the function itself is returned untouched, so
+    # it costs nothing per call. benchmarks/check_query_budgets.py enforces the
+    # budgets, and the middleware logs requests that exceed them.
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+class Histogram:
+    # Cumulative buckets are only computed when rendering; observe() is a bisect
+    # and two additions under the registry lock
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: list) -> None:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Set per request by the middleware; the threadpool copies the context, so cursor
+# hooks running on worker threads still find the request's stats object
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.engine_queries: Dict[str, int] = {}
+        self.engine_seconds: Dict[str, float] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.request_queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.request_db_time[key] = Histogram(DB_TIME_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.request_queries[key].observe(stats.queries)
+            self.request_db_time[key].observe(stats.db_seconds)
+
+    def observe_query(self, engine_name: str, seconds: float) -> None:
+        with self._lock:
+            self.engine_queries[engine_name] = self.engine_queries.get(engine_name, 0) + 1
+            self.engine_seconds[engine_name] = self.engine_seconds.get(engine_name, 0.0) + seconds
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_requests_total Requests handled, by route template and status code.")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            for name, help_text, histograms in (
+                ("http_request_duration_seconds", "Request latency.", self.latency),
+                ("http_request_db_queries", "SQL statements issued per request.", self.request_queries),
+                ("http_request_db_seconds", "Time spent in SQL statements per request.", self.request_db_time),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    histogram.render(name, f'method="{method}",route="{route}"', lines)
+            lines.append("# HELP db_queries_total SQL statements executed, by engine.")
+            lines.append("# TYPE db_queries_total counter")
+            for engine_name, count in sorted(self.engine_queries.items()):
+                lines.append(f'db_queries_total{{engine="{engine_name}"}} {count}')
+            lines.append("# HELP db_query_seconds_total Time spent in SQL statements, by engine.")
+            lines.append("# TYPE db_query_seconds_total counter")
+            for engine_name, seconds in sorted(self.engine_seconds.items()):
+                lines.append(f'db_query_seconds_total{{engine="{engine_name}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def instrument_engine(engine, name: str) -> None:
+    # Accepts a sync Engine or the sync_engine behind an AsyncEngine
+    if not METRICS_ENABLED:
+        return
+
+    # The start time rides on the statement's execution context rather than a
+    # per-connection stack, so a statement that fails leaves nothing behind
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started_at = time.perf_counter()
+
+    def record(context) -> None:
+        started_at = getattr(context, "_metrics_started_at", None)
+        if started_at is None:
+            return
+        del context._metrics_started_at
+        elapsed = time.perf_counter() - started_at
+        metrics_registry.observe_query(name, elapsed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record(context)
+
+    def handle_error(exception_context):
+        # Failed statements still took a round trip; count them like the rest
+        record(exception_context.execution_context)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task or body buffering per request
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            route_label = getattr(route, "path_format", None) or "unmatched"
+            metrics_registry.observe_request(scope["method"], route_label, status_holder[0], elapsed, stats)
+            budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+            if budget is not None and stats.queries > budget:
+                logger.warning("%s %s issued %s queries (budget %s)", scope["method"], route_label, stats.queries, budget)
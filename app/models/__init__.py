@@ -0,0 +1,9 @@
+# Importing any model loads every main-database model, so the relationships
+# User and Subscription declare by name always resolve, whatever was imported first.
+# Session lives on the separate session database and is imported on its own.
+from app.models.user import User
+from app.models.plan import Plan
+from app.models.payment import Payment
+from app.models.subscription import Subscription
+from app.models.device import Device
+from app.models.payment_rollup import PaymentDailyRollup
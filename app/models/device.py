@@ -1,15 +1,24 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, literal_column
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.db import Base
+from app.models.user import User
+from app.models.subscription import Subscription
 
 class Device(Base):
     __tablename__ = "devices"
 
     device_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"))
+    user_id = Column(Integer, ForeignKey("users.user_id"), index=True)
     subscription_id = Column(Integer, ForeignKey("subscriptions.subscription_id"))
-    imei_number = Column(String, nullable=False)
+    imei_number = Column(String, nullable=False, index=True)
     device_type = Column(String)
     model = Column(String)
     status = Column(String)
-    added_on = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    added_on = Column(DateTime, default=datetime.utcnow)
+    # Bumped by every UPDATE, ORM or Core; conditional GETs derive their ETag from it
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
+
+    # The collections live on the parents (User.devices, Subscription.devices)
+    user = relationship(User, back_populates="devices")
+    subscription = relationship(Subscription, back_populates="devices")
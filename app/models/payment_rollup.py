@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Date, Float
+from app.database.db import Base
+
+class PaymentDailyRollup(Base):
+    # One row per UTC day, plan and status; kept in step with payments by
+    # app/database/payment_rollups.py so revenue queries never scan payments
+    __tablename__ = "payment_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    plan_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    payment_count = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<PaymentDailyRollup {self.day} plan={self.plan_id} status={self.status}>"
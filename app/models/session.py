@@ -1,14 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from datetime import datetime, timedelta
 from app.database.session_db import Base
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_user_id_expires_at", "user_id", "expires_at"),
+    )
 
     session_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer)
-    token = Column(String)
+    token = Column(String, index=True)
     ip_address = Column(String)
     device_info = Column(String)
-    expires_at = Column(DateTime, default=datetime.utcnow() + timedelta(hours=1))
+    expires_at = Column(DateTime, default=datetime.utcnow() + timedelta(hours=1), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
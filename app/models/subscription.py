@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Index, literal_column, text
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.db import Base
+from app.models.user import User
+from app.models.plan import Plan
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_user_id_status", "user_id", "status"),
+        Index("ix_subscriptions_active_end_date", "end_date", postgresql_where=text("status = 'active'")),
+    )
 
     subscription_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
@@ -14,6 +21,11 @@ class Subscription(Base):
     renewal_type = Column(String(50), nullable=False)
     payment_id = Column(Integer, ForeignKey("payments.payment_id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
+
+    user = relationship(User, back_populates="subscriptions")
+    plan = relationship(Plan)
+    devices = relationship("Device", back_populates="subscription", passive_deletes=True)
 
     def __repr__(self):
         return f"<Subscription {self.subscription_id}>"
\ No newline at end of file
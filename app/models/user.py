@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.db import Base
 
@@ -10,8 +11,15 @@ class User(Base):
     email = Column(String(100), unique=True, nullable=False)
     phone = Column(String(20))
     address = Column(String(200))
+    password_hash = Column(String(200), nullable=False, default='')
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # Named by string so this module needn't import its children (app.models imports
+    # them all); passive_deletes leaves the children to the database when a user is deleted
+    devices = relationship("Device", back_populates="user", passive_deletes=True)
+    subscriptions = relationship("Subscription", back_populates="user", passive_deletes=True)
+    payments = relationship("Payment", back_populates="user", passive_deletes=True)
+
     def __repr__(self):
         return f"<User {self.user_id}>"
\ No newline at end of file
@@ -1,77 +1,234 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from app.database.db import get_db
-from app.schemas.device import DeviceCreate, Device, DeviceUpdate
+from app.database.db import get_db, get_read_db, execute
+from app.database.pagination import NEXT_CURSOR_RESPONSES, paginate, set_next_cursor
+from app.database.fast_json import FAST_JSON_ENABLED, row_columns, rows_response
+from app.database.etag import etag_matches, not_modified, row_etag
+from app.schemas.device import DeviceCreate, Device, DeviceUpdate, DeviceBulkReport
 from app.models.device import Device as DeviceModel
-from app.models.user import User as UserModel
-from app.models.subscription import Subscription as SubscriptionModel
-from app.auth.auth import get_current_user
+from app.schemas.user import Principal
+from app.auth.auth import get_current_principal
+from app.crud.device import bulk_create_devices, check_device_owner
+from app.metrics import query_budget
 from datetime import datetime
+from collections import deque
+import codecs
+import csv
+import json
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+BULK_BATCH_SIZE = int(os.getenv("DEVICE_BULK_BATCH_SIZE", "5000"))
+BULK_MAX_ERRORS = int(os.getenv("DEVICE_BULK_MAX_ERRORS", "1000"))
+
+async def _iter_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+class _LineFeed:
+    # Hands lines to a csv.reader as they arrive from the request stream; the
+    # reader asks for more only while a row is incomplete
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def _iter_records(request: Request):
+    # Yields (record, error) pairs for each non-empty data row of an NDJSON or CSV body
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        feed = _LineFeed()
+        reader = csv.reader(feed)
+        header = None
+        # A quoted field can span lines; the row is only parsed once its quotes balance
+        in_quotes = False
+        async for line in _iter_lines(request):
+            if not in_quotes and not line.strip():
+                continue
+            feed.lines.append(line + "\n")
+            if line.count('"') % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            try:
+                values = next(reader)
+            except csv.Error as e:
+                feed.lines.clear()
+                yield None, f"Invalid CSV: {e}"
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield {key: (value if value != "" else None) for key, value in zip(header, values)}, None
+        if in_quotes:
+            yield None, "Invalid CSV: unterminated quoted field"
+    elif "ndjson" in content_type or "jsonlines" in content_type:
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield None, f"Invalid JSON: {e.msg}"
+    else:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or text/csv")
+
 @router.post("/", response_model=Device)
+@query_budget(2)
 def create_device(device: DeviceCreate, 
                  db: Session = Depends(get_db),
-                 current_user: UserModel = Depends(get_current_user)):
+                 current_user: Principal = Depends(get_current_principal)):
     # Verify user exists and has valid subscription
-    user = db.query(UserModel).filter(UserModel.user_id == device.user_id).first()
-    if not user:
+    user_exists, has_subscription = check_device_owner(db, device.user_id)
+    if not user_exists:
         raise HTTPException(status_code=404, detail="User not found")
     
-    subscription = db.query(SubscriptionModel).filter(
-        SubscriptionModel.user_id == device.user_id,
-        SubscriptionModel.status == "active"
-    ).first()
-    
-    if not subscription:
+    if not has_subscription:
         raise HTTPException(status_code=400, detail="User does not have an active subscription")
     
     # Create new device
     db_device = DeviceModel(
         user_id=device.user_id,
-        device_name=device.device_name,
+        subscription_id=device.subscription_id,
+        imei_number=device.imei_number,
         device_type=device.device_type,
-        mac_address=device.mac_address,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        model=device.model,
+        status=device.status,
+        added_on=datetime.utcnow()
     )
     db.add(db_device)
     db.commit()
-    db.refresh(db_device)
     return db_device
 
+@router.post("/bulk", response_model=DeviceBulkReport)
+@query_budget(3)
+async def bulk_create(request: Request,
+                      db: Session = Depends(get_db),
+                      current_user: Principal = Depends(get_current_principal)):
+    inserted = 0
+    failed = 0
+    errors = []
+    owner_errors = {}
+    known_subscriptions = {}
+    batch = []
+
+    def record_errors(row_errors):
+        nonlocal failed
+        failed += len(row_errors)
+        for row_number, error in row_errors:
+            if len(errors) < BULK_MAX_ERRORS:
+                errors.append({"row": row_number, "error": error})
+
+    async def flush():
+        nonlocal inserted
+        count, row_errors = await run_in_threadpool(bulk_create_devices, db, batch, owner_errors,
+                                                     known_subscriptions)
+        inserted += count
+        record_errors(row_errors)
+        batch.clear()
+
+    row_number = 0
+    async for record, error in _iter_records(request):
+        row_number += 1
+        if error is None:
+            try:
+                batch.append((row_number, DeviceCreate.model_validate(record)))
+            except ValidationError as e:
+                first = e.errors()[0]
+                error = f"{'.'.join(str(loc) for loc in first['loc'])}: {first['msg']}"
+        if error is not None:
+            record_errors([(row_number, error)])
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    logger.info("Bulk device upload: %s inserted, %s failed", inserted, failed)
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
+
 @router.get("/{device_id}", response_model=Device)
-def get_device(device_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching device with ID: {device_id}")
-    db_device = db.query(DeviceModel).filter(DeviceModel.device_id == device_id).first()
+@query_budget(2)
+async def get_device(device_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                     db: Session = Depends(get_read_db)):
+    logger.info("Fetching device with ID: %s", device_id)
+    if if_none_match is not None:
+        # Polling clients usually hold the current version; check it without loading the row
+        result = await execute(db, select(DeviceModel.version).where(DeviceModel.device_id == device_id))
+        version = result.scalar()
+        if version is not None and etag_matches(if_none_match, row_etag(device_id, version)):
+            return not_modified(row_etag(device_id, version))
+    result = await execute(db, select(DeviceModel).where(DeviceModel.device_id == device_id))
+    db_device = result.scalars().first()
     if db_device is None:
-        logger.warning(f"Device not found with ID: {device_id}")
+        logger.warning("Device not found with ID: %s", device_id)
         raise HTTPException(status_code=404, detail="Device not found")
+    response.headers["ETag"] = row_etag(device_id, db_device.version)
     return db_device
 
 @router.get("/user/{user_id}", response_model=List[Device])
-def get_user_devices(user_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching devices for user ID: {user_id}")
-    devices = db.query(DeviceModel).filter(DeviceModel.user_id == user_id).all()
-    logger.info(f"Found {len(devices)} devices for user {user_id}")
+@query_budget(1)
+async def get_user_devices(user_id: int, db: Session = Depends(get_read_db)):
+    logger.info("Fetching devices for user ID: %s", user_id)
+    if FAST_JSON_ENABLED:
+        result = await execute(db, select(*row_columns(DeviceModel, Device)).where(DeviceModel.user_id == user_id))
+        rows = result.all()
+        logger.info("Found %s devices for user %s", len(rows), user_id)
+        return rows_response(rows)
+    result = await execute(db, select(DeviceModel).where(DeviceModel.user_id == user_id))
+    devices = result.scalars().all()
+    logger.info("Found %s devices for user %s", len(devices), user_id)
     return devices
 
-@router.get("/", response_model=List[Device])
-def get_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logger.info(f"Fetching devices with skip={skip}, limit={limit}")
-    devices = db.query(DeviceModel).offset(skip).limit(limit).all()
-    logger.info(f"Found {len(devices)} devices")
+@router.get("/", response_model=List[Device], responses=NEXT_CURSOR_RESPONSES)
+@query_budget(1)
+async def get_devices(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                      db: Session = Depends(get_read_db)):
+    logger.info("Fetching devices with skip=%s, limit=%s, cursor=%s", skip, limit, cursor)
+    if FAST_JSON_ENABLED:
+        query = select(*row_columns(DeviceModel, Device))
+        rows = (await execute(db, paginate(query, DeviceModel.device_id, skip, limit, cursor))).all()
+        set_next_cursor(response, rows, "device_id", limit)
+        logger.info("Found %s devices", len(rows))
+        return rows_response(rows, response)
+    result = await execute(db, paginate(select(DeviceModel), DeviceModel.device_id, skip, limit, cursor))
+    devices = result.scalars().all()
+    set_next_cursor(response, devices, "device_id", limit)
+    logger.info("Found %s devices", len(devices))
     return devices
 
 @router.put("/{device_id}", response_model=Device)
+@query_budget(2)
 def update_device(device_id: int, 
                  device: DeviceUpdate, 
                  db: Session = Depends(get_db),
-                 current_user: UserModel = Depends(get_current_user)):
+                 current_user: Principal = Depends(get_current_principal)):
     db_device = db.query(DeviceModel).filter(DeviceModel.device_id == device_id).first()
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
@@ -86,13 +243,13 @@ def update_device(device_id: int,
     
     db_device.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(db_device)
     return db_device
 
 @router.delete("/{device_id}")
+@query_budget(2)
 def delete_device(device_id: int, 
                  db: Session = Depends(get_db),
-                 current_user: UserModel = Depends(get_current_user)):
+                 current_user: Principal = Depends(get_current_principal)):
     db_device = db.query(DeviceModel).filter(DeviceModel.device_id == device_id).first()
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+from app.database.pool import pool_metrics
+from app.auth.hashing import password_hasher
+from app.auth.login_throttle import login_throttle
+from app.logging_config import logging_pipeline
+from app.metrics import query_budget
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/pool")
+@query_budget(0)
+def get_pool_stats():
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+@router.get("/password-hashing")
+@query_budget(0)
+def get_password_hashing_stats():
+    return password_hasher.stats()
+
+@router.get("/login-throttle")
+@query_budget(0)
+def get_login_throttle_stats():
+    return login_throttle.stats()
+
+@router.get("/logging")
+@query_budget(0)
+def get_logging_stats():
+    return logging_pipeline.stats()
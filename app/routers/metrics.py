@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.metrics import metrics_registry, query_budget
+
+router = APIRouter()
+
+# Prometheus text exposition format
+@router.get("/metrics", response_class=PlainTextResponse)
+@query_budget(0)
+def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
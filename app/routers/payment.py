@@ -1,69 +1,230 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database.db import get_db
-from app.schemas.payment import PaymentCreate, Payment, PaymentUpdate
+from app.database.db import get_db, get_read_db, execute, SessionLocal
+from app.database.fast_json import FAST_JSON_ENABLED, row_columns, rows_response
+from app.schemas.payment import PaymentCreate, Payment, PaymentUpdate, PaymentRollup, DailyRevenue, PlanRevenue
 from app.models.payment import Payment as PaymentModel
 from app.models.user import User as UserModel
 from app.models.plan import Plan as PlanModel
-from app.auth.auth import get_current_user
-from datetime import datetime
+from app.models.subscription import Subscription as SubscriptionModel
+from app.models.payment_rollup import PaymentDailyRollup as RollupModel
+from app.schemas.user import Principal
+from app.auth.auth import get_current_principal
+from app.database.payment_rollups import apply_payment_change, apply_payment_delta, rollup_key
+from app.metrics import query_budget
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+EXPORT_BATCH_SIZE = int(os.getenv("PAYMENT_EXPORT_BATCH_SIZE", "2000"))
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("PAYMENT_ANALYTICS_DEFAULT_DAYS", "30"))
+ANALYTICS_MAX_DAYS = int(os.getenv("PAYMENT_ANALYTICS_MAX_DAYS", "1096"))
+EXPORT_COLUMNS = [
+    PaymentModel.payment_id,
+    PaymentModel.user_id,
+    PaymentModel.plan_id,
+    PaymentModel.amount,
+    PaymentModel.payment_method,
+    PaymentModel.status,
+    PaymentModel.transaction_id,
+    PaymentModel.payment_date,
+]
+
+def _export_values(row):
+    return [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+def _export_rows(query, export_format: str):
+    # Owns its session so it stays open for as long as the response streams;
+    # yield_per makes psycopg2 use a server-side cursor and fetch in batches
+    names = [column.key for column in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(names)
+        yield buffer.getvalue()
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(_export_values(row) for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(names, _export_values(row)))) + "\n" for row in rows)
+    finally:
+        db.close()
+
+def _analytics_query(query, start_date: Optional[date], end_date: Optional[date],
+                     plan_id: Optional[int], status: Optional[str]):
+    # Days are UTC, like payment_date; end_date is exclusive, as on the export
+    end_date = end_date or datetime.utcnow().date() + timedelta(days=1)
+    start_date = start_date or end_date - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    if (end_date - start_date).days > ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {ANALYTICS_MAX_DAYS} days")
+    # Deletes and moves leave rows at zero until the next rebuild clears them
+    query = query.where(RollupModel.day >= start_date, RollupModel.day < end_date, RollupModel.payment_count > 0)
+    if plan_id is not None:
+        query = query.where(RollupModel.plan_id == plan_id)
+    if status is not None:
+        query = query.where(RollupModel.status == status)
+    return query
+
 @router.get("/test")
-def test_endpoint():
+@query_budget(0)
+async def test_endpoint():
     logger.info("Test endpoint called")
     return {"message": "Payment router is working"}
 
 @router.post("/", response_model=Payment)
+@query_budget(2)
 def create_payment(payment: PaymentCreate, 
                   db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
+                  current_user: Principal = Depends(get_current_principal)):
     # Create new payment
     db_payment = PaymentModel(
         user_id=payment.user_id,
+        plan_id=payment.plan_id,
         amount=payment.amount,
         payment_method=payment.payment_method,
         status=payment.status,
         transaction_id=payment.transaction_id,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        payment_date=datetime.utcnow()
     )
     db.add(db_payment)
+    # Same transaction as the insert, so the rollups never count an uncommitted payment
+    apply_payment_delta(db, rollup_key(db_payment), 1, db_payment.amount)
     db.commit()
-    db.refresh(db_payment)
     return db_payment
 
+@router.get("/export")
+@query_budget(1)
+def export_payments(start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None,
+                    status: Optional[str] = None,
+                    export_format: str = Query("ndjson", alias="format"),
+                    current_user: Principal = Depends(get_current_principal)):
+    if export_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    logger.info("Exporting payments start_date=%s, end_date=%s, status=%s, format=%s", start_date, end_date, status, export_format)
+    query = select(*EXPORT_COLUMNS).order_by(PaymentModel.payment_id)
+    if start_date is not None:
+        query = query.where(PaymentModel.payment_date >= start_date)
+    if end_date is not None:
+        query = query.where(PaymentModel.payment_date < end_date)
+    if status is not None:
+        query = query.where(PaymentModel.status == status)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="payments.{export_format}"'},
+    )
+
+# Analytics read only the daily rollups, so their cost grows with the number of
+# days asked for rather than the number of payments
+
+@router.get("/analytics", response_model=List[PaymentRollup])
+@query_budget(1)
+async def get_payment_analytics(start_date: Optional[date] = None,
+                                end_date: Optional[date] = None,
+                                plan_id: Optional[int] = None,
+                                status: Optional[str] = None,
+                                db: Session = Depends(get_read_db),
+                                current_user: Principal = Depends(get_current_principal)):
+    query = _analytics_query(select(RollupModel), start_date, end_date, plan_id, status)
+    result = await execute(db, query.order_by(RollupModel.day, RollupModel.plan_id, RollupModel.status))
+    return result.scalars().all()
+
+@router.get("/analytics/daily", response_model=List[DailyRevenue])
+@query_budget(1)
+async def get_daily_revenue(start_date: Optional[date] = None,
+                            end_date: Optional[date] = None,
+                            plan_id: Optional[int] = None,
+                            status: Optional[str] = "paid",
+                            db: Session = Depends(get_read_db),
+                            current_user: Principal = Depends(get_current_principal)):
+    query = select(
+        RollupModel.day,
+        func.sum(RollupModel.payment_count).label("payment_count"),
+        func.sum(RollupModel.amount_total).label("amount_total"),
+    )
+    query = _analytics_query(query, start_date, end_date, plan_id, status)
+    result = await execute(db, query.group_by(RollupModel.day).order_by(RollupModel.day))
+    return result.all()
+
+@router.get("/analytics/plans", response_model=List[PlanRevenue])
+@query_budget(1)
+async def get_plan_revenue(start_date: Optional[date] = None,
+                           end_date: Optional[date] = None,
+                           status: Optional[str] = "paid",
+                           db: Session = Depends(get_read_db),
+                           current_user: Principal = Depends(get_current_principal)):
+    query = select(
+        RollupModel.plan_id,
+        func.sum(RollupModel.payment_count).label("payment_count"),
+        func.sum(RollupModel.amount_total).label("amount_total"),
+    )
+    query = _analytics_query(query, start_date, end_date, None, status)
+    result = await execute(db, query.group_by(RollupModel.plan_id).order_by(RollupModel.plan_id))
+    return result.all()
+
 @router.get("/{payment_id}", response_model=Payment)
-def get_payment(payment_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching payment with ID: {payment_id}")
-    db_payment = db.query(PaymentModel).filter(PaymentModel.payment_id == payment_id).first()
+@query_budget(1)
+async def get_payment(payment_id: int, db: Session = Depends(get_read_db)):
+    logger.info("Fetching payment with ID: %s", payment_id)
+    result = await execute(db, select(PaymentModel).where(PaymentModel.payment_id == payment_id))
+    db_payment = result.scalars().first()
     if db_payment is None:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(status_code=404, detail="Payment not found")
     return db_payment
 
 @router.get("/user/{user_id}", response_model=List[Payment])
-def get_user_payments(user_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching payments for user ID: {user_id}")
-    payments = db.query(PaymentModel).filter(PaymentModel.user_id == user_id).all()
-    logger.info(f"Found {len(payments)} payments for user {user_id}")
+@query_budget(1)
+async def get_user_payments(user_id: int, db: Session = Depends(get_read_db)):
+    logger.info("Fetching payments for user ID: %s", user_id)
+    if FAST_JSON_ENABLED:
+        result = await execute(db, select(*row_columns(PaymentModel, Payment)).where(PaymentModel.user_id == user_id))
+        rows = result.all()
+        logger.info("Found %s payments for user %s", len(rows), user_id)
+        return rows_response(rows)
+    result = await execute(db, select(PaymentModel).where(PaymentModel.user_id == user_id))
+    payments = result.scalars().all()
+    logger.info("Found %s payments for user %s", len(payments), user_id)
     return payments
 
 @router.get("/subscription/{subscription_id}", response_model=List[Payment])
-def get_subscription_payments(subscription_id: int, db: Session = Depends(get_db)):
-    payments = db.query(PaymentModel).filter(PaymentModel.subscription_id == subscription_id).all()
+@query_budget(1)
+async def get_subscription_payments(subscription_id: int, db: Session = Depends(get_read_db)):
+    # Payments don't reference subscriptions; a subscription points at the payment that funded it
+    result = await execute(db, select(PaymentModel)
+                           .join(SubscriptionModel, SubscriptionModel.payment_id == PaymentModel.payment_id)
+                           .where(SubscriptionModel.subscription_id == subscription_id))
+    payments = result.scalars().all()
     return payments
 
 @router.put("/{payment_id}", response_model=Payment)
+@query_budget(4)
 def update_payment(payment_id: int, 
                   payment: PaymentUpdate, 
                   db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
-    db_payment = db.query(PaymentModel).filter(PaymentModel.payment_id == payment_id).first()
+                  current_user: Principal = Depends(get_current_principal)):
+    # Locked so a concurrent update can't read the same old values and move the
+    # payment's rollup contribution twice
+    db_payment = db.query(PaymentModel).filter(PaymentModel.payment_id == payment_id).with_for_update().first()
     if db_payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
@@ -71,20 +232,21 @@ def update_payment(payment_id: int,
     if db_payment.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this payment")
     
+    old_key, old_amount = rollup_key(db_payment), db_payment.amount
     update_data = payment.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_payment, key, value)
     
-    db_payment.updated_at = datetime.utcnow()
+    apply_payment_change(db, old_key, old_amount, rollup_key(db_payment), db_payment.amount)
     db.commit()
-    db.refresh(db_payment)
     return db_payment
 
 @router.delete("/{payment_id}")
+@query_budget(3)
 def delete_payment(payment_id: int, 
                   db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
-    db_payment = db.query(PaymentModel).filter(PaymentModel.payment_id == payment_id).first()
+                  current_user: Principal = Depends(get_current_principal)):
+    db_payment = db.query(PaymentModel).filter(PaymentModel.payment_id == payment_id).with_for_update().first()
     if db_payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
@@ -92,6 +254,7 @@ def delete_payment(payment_id: int,
     if db_payment.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this payment")
     
+    apply_payment_delta(db, rollup_key(db_payment), -1, -db_payment.amount)
     db.delete(db_payment)
     db.commit()
     return {"message": "Payment deleted successfully"}
\ No newline at end of file
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database.db import get_db
+from app.database.db import get_db, get_read_db
+from app.database.pagination import decode_cursor, set_next_cursor, NEXT_CURSOR_HEADER, NEXT_CURSOR_RESPONSES
+from app.database.etag import etag_matches, not_modified, row_etag
 from app.schemas.plan import PlanCreate, Plan, PlanUpdate
 from app.models.plan import Plan as PlanModel
 from app.models.user import User as UserModel
-from app.auth.auth import get_current_user
+from app.schemas.user import Principal
+from app.auth.auth import get_current_principal
+from app.crud.plan_catalog import plan_catalog, notify_plan_change
+from app.metrics import query_budget
 from datetime import datetime
 import logging
 
@@ -13,49 +18,67 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=Plan)
+@query_budget(1)
 def create_plan(plan: PlanCreate, 
                 db: Session = Depends(get_db),
-                current_user: UserModel = Depends(get_current_user)):
+                current_user: Principal = Depends(get_current_principal)):
     # Create new plan
     db_plan = PlanModel(
+        product_id=plan.product_id,
         name=plan.name,
-        description=plan.description,
         price=plan.price,
         duration_days=plan.duration_days,
-        max_devices=plan.max_devices,
         features=plan.features,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        is_active=plan.is_active,
+        created_at=datetime.utcnow()
     )
     db.add(db_plan)
+    notify_plan_change(db)
     db.commit()
-    db.refresh(db_plan)
+    plan_catalog.invalidate()
     return db_plan
 
 @router.get("/{plan_id}", response_model=Plan)
-def get_plan(plan_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching plan with ID: {plan_id}")
-    db_plan = db.query(PlanModel).filter(PlanModel.plan_id == plan_id).first()
+@query_budget(1)
+async def get_plan(plan_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                   db: Session = Depends(get_read_db)):
+    logger.info("Fetching plan with ID: %s", plan_id)
+    catalog = await plan_catalog.snapshot(db)
+    db_plan = catalog.by_id.get(plan_id)
     if db_plan is None:
-        logger.warning(f"Plan not found with ID: {plan_id}")
+        logger.warning("Plan not found with ID: %s", plan_id)
         raise HTTPException(status_code=404, detail="Plan not found")
+    etag = row_etag(plan_id, catalog.versions[plan_id])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return db_plan
 
-@router.get("/", response_model=List[Plan])
-def get_plans(active_only: bool = True, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logger.info(f"Fetching plans with active_only={active_only}, skip={skip}, limit={limit}")
-    query = db.query(PlanModel)
-    if active_only:
-        query = query.filter(PlanModel.is_active == True)
-    plans = query.offset(skip).limit(limit).all()
-    logger.info(f"Found {len(plans)} plans")
+@router.get("/", response_model=List[Plan], responses=NEXT_CURSOR_RESPONSES)
+@query_budget(1)
+async def get_plans(response: Response, active_only: bool = True, skip: int = 0, limit: int = 100,
+                    cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    logger.info("Fetching plans with active_only=%s, skip=%s, limit=%s, cursor=%s", active_only, skip, limit, cursor)
+    catalog = await plan_catalog.snapshot(db)
+    if active_only and skip == 0 and limit == 100 and cursor is None:
+        headers = {NEXT_CURSOR_HEADER: catalog.default_next_cursor} if catalog.default_next_cursor else None
+        return Response(content=catalog.default_response, media_type="application/json", headers=headers)
+    plans = [plan for plan in catalog.plans if plan.is_active or not active_only]
+    if cursor is not None:
+        last_key = decode_cursor(cursor)
+        plans = [plan for plan in plans if plan.plan_id > last_key][:limit]
+    else:
+        plans = plans[skip:skip + limit]
+    set_next_cursor(response, plans, "plan_id", limit)
+    logger.info("Found %s plans", len(plans))
     return plans
 
 @router.put("/{plan_id}", response_model=Plan)
+@query_budget(2)
 def update_plan(plan_id: int, 
                 plan: PlanUpdate, 
                 db: Session = Depends(get_db),
-                current_user: UserModel = Depends(get_current_user)):
+                current_user: Principal = Depends(get_current_principal)):
     db_plan = db.query(PlanModel).filter(PlanModel.plan_id == plan_id).first()
     if db_plan is None:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -65,18 +88,22 @@ def update_plan(plan_id: int,
         setattr(db_plan, key, value)
     
     db_plan.updated_at = datetime.utcnow()
+    notify_plan_change(db)
     db.commit()
-    db.refresh(db_plan)
+    plan_catalog.invalidate()
     return db_plan
 
 @router.delete("/{plan_id}")
+@query_budget(2)
 def delete_plan(plan_id: int, 
                 db: Session = Depends(get_db),
-                current_user: UserModel = Depends(get_current_user)):
+                current_user: Principal = Depends(get_current_principal)):
     db_plan = db.query(PlanModel).filter(PlanModel.plan_id == plan_id).first()
     if db_plan is None:
         raise HTTPException(status_code=404, detail="Plan not found")
     
     db.delete(db_plan)
+    notify_plan_change(db)
     db.commit()
+    plan_catalog.invalidate()
     return {"message": "Plan deleted successfully"}
\ No newline at end of file
@@ -5,49 +5,40 @@ from app.database.db import get_db
 from app.schemas.session import SessionCreate, Session, SessionUpdate
 from app.models.session import Session as SessionModel
 from app.models.user import User as UserModel
-from app.models.device import Device as DeviceModel
-from app.auth.auth import get_current_user
-from datetime import datetime
+from app.schemas.user import Principal
+from app.auth.auth import get_current_principal
+from app.auth.session import get_current_session, session_store
+from app.metrics import query_budget
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=Session)
+@query_budget(2)
 def create_session(session: SessionCreate, 
                   db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
+                  current_user: Principal = Depends(get_current_principal)):
     # Verify user exists
     user = db.query(UserModel).filter(UserModel.user_id == session.user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Verify device exists
-    device = db.query(DeviceModel).filter(DeviceModel.device_id == session.device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
-    # Create new session
-    db_session = SessionModel(
-        user_id=session.user_id,
-        device_id=session.device_id,
-        start_time=session.start_time,
-        end_time=session.end_time,
-        status=session.status,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    # Sessions live in the separate session database, behind the configured store
+    return session_store.create(session.user_id, session.ip_address, session.device_info,
+                                session.token, session.expires_at)
+
+@router.get("/current", response_model=Session)
+@query_budget(1)
+def read_current_session(current_session: SessionModel = Depends(get_current_session)):
+    return current_session
 
 @router.put("/{session_id}", response_model=Session)
+@query_budget(2)
 def update_session(session_id: int, 
                   session: SessionUpdate, 
-                  db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
-    db_session = db.query(SessionModel).filter(SessionModel.session_id == session_id).first()
+                  current_user: Principal = Depends(get_current_principal)):
+    db_session = session_store.get_by_id(session_id)
     if db_session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -55,20 +46,13 @@ def update_session(session_id: int,
     if db_session.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this session")
     
-    update_data = session.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_session, key, value)
-    
-    db_session.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    return session_store.update(db_session, session.model_dump(exclude_unset=True))
 
 @router.delete("/{session_id}")
+@query_budget(2)
 def delete_session(session_id: int, 
-                  db: Session = Depends(get_db),
-                  current_user: UserModel = Depends(get_current_user)):
-    db_session = db.query(SessionModel).filter(SessionModel.session_id == session_id).first()
+                  current_user: Principal = Depends(get_current_principal)):
+    db_session = session_store.get_by_id(session_id)
     if db_session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -76,6 +60,6 @@ def delete_session(session_id: int,
     if db_session.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this session")
     
-    db.delete(db_session)
-    db.commit()
+    # Also drops it from the store's cache, so the token stops validating at once
+    session_store.delete(db_session)
     return {"message": "Session deleted successfully"}
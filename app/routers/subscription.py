@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database.db import get_db
+from app.database.db import get_db, get_read_db, execute
+from app.database.pagination import NEXT_CURSOR_RESPONSES, paginate, set_next_cursor
+from app.database.fast_json import FAST_JSON_ENABLED, row_columns, rows_response
+from app.database.etag import collection_etag, etag_matches, not_modified
 from app.schemas.subscription import SubscriptionCreate, Subscription, SubscriptionUpdate
 from app.models.subscription import Subscription as SubscriptionModel
-from app.models.user import User as UserModel
-from app.models.plan import Plan as PlanModel
-from app.models.payment import Payment as PaymentModel
-from app.auth.auth import get_current_user
+from app.schemas.user import Principal
+from app.auth.auth import get_current_principal
+from app.crud.subscription import check_subscription_references
+from app.metrics import query_budget
 from datetime import datetime, timedelta, date
 import logging
 
@@ -15,34 +19,30 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/test")
-def test_endpoint():
+@query_budget(0)
+async def test_endpoint():
     logger.info("Test endpoint called")
     return {"message": "Subscription router is working"}
 
 @router.post("/", response_model=Subscription)
+@query_budget(2)
 def create_subscription(subscription: SubscriptionCreate, 
                        db: Session = Depends(get_db),
-                       current_user: UserModel = Depends(get_current_user)):
-    # Verify user exists
-    user = db.query(UserModel).filter(UserModel.user_id == subscription.user_id).first()
-    if not user:
+                       current_user: Principal = Depends(get_current_principal)):
+    # Verify the referenced user, plan and payment in one round trip
+    refs = check_subscription_references(db, user_id=subscription.user_id, plan_id=subscription.plan_id,
+                                         payment_id=subscription.payment_id)
+    if not refs["user"]:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Verify plan exists
-    plan = db.query(PlanModel).filter(PlanModel.plan_id == subscription.plan_id).first()
-    if not plan:
+    if not refs["plan"]:
         raise HTTPException(status_code=404, detail="Plan not found")
-    
-    # If payment_id is provided, check if it exists
-    if subscription.payment_id is not None:
-        payment = db.query(PaymentModel).filter(PaymentModel.payment_id == subscription.payment_id).first()
-        if not payment:
-            logger.error(f"Payment not found: {subscription.payment_id}")
-            raise HTTPException(status_code=404, detail="Payment not found")
+    if not refs["payment"]:
+        logger.error("Payment not found: %s", subscription.payment_id)
+        raise HTTPException(status_code=404, detail="Payment not found")
     
     # Calculate end date based on plan duration if not provided
     if subscription.end_date is None:
-        end_date = subscription.start_date + timedelta(days=plan.duration_days)
+        end_date = subscription.start_date + timedelta(days=refs["plan_duration_days"])
     else:
         end_date = subscription.end_date
     
@@ -55,47 +55,73 @@ def create_subscription(subscription: SubscriptionCreate,
         status=subscription.status,
         renewal_type=subscription.renewal_type,
         payment_id=subscription.payment_id,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        created_at=datetime.utcnow()
     )
     db.add(db_subscription)
     db.commit()
-    db.refresh(db_subscription)
-    logger.info(f"Subscription created successfully: {db_subscription.subscription_id}")
+    logger.info("Subscription created successfully: %s", db_subscription.subscription_id)
     return db_subscription
 
 @router.get("/{subscription_id}", response_model=Subscription)
-def get_subscription(subscription_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching subscription with ID: {subscription_id}")
-    db_subscription = db.query(SubscriptionModel).filter(SubscriptionModel.subscription_id == subscription_id).first()
+@query_budget(1)
+async def get_subscription(subscription_id: int, db: Session = Depends(get_read_db)):
+    logger.info("Fetching subscription with ID: %s", subscription_id)
+    result = await execute(db, select(SubscriptionModel).where(SubscriptionModel.subscription_id == subscription_id))
+    db_subscription = result.scalars().first()
     if db_subscription is None:
-        logger.warning(f"Subscription not found with ID: {subscription_id}")
+        logger.warning("Subscription not found with ID: %s", subscription_id)
         raise HTTPException(status_code=404, detail="Subscription not found")
     return db_subscription
 
 @router.get("/user/{user_id}", response_model=List[Subscription])
-def get_user_subscriptions(user_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching subscriptions for user ID: {user_id}")
-    subscriptions = db.query(SubscriptionModel).filter(SubscriptionModel.user_id == user_id).all()
-    logger.info(f"Found {len(subscriptions)} subscriptions for user {user_id}")
+@query_budget(2)
+async def get_user_subscriptions(user_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                                 db: Session = Depends(get_read_db)):
+    logger.info("Fetching subscriptions for user ID: %s", user_id)
+    if if_none_match is not None:
+        result = await execute(db, select(SubscriptionModel.subscription_id, SubscriptionModel.version)
+                               .where(SubscriptionModel.user_id == user_id)
+                               .order_by(SubscriptionModel.subscription_id))
+        etag = collection_etag(result.all())
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    result = await execute(db, select(SubscriptionModel).where(SubscriptionModel.user_id == user_id)
+                           .order_by(SubscriptionModel.subscription_id))
+    subscriptions = result.scalars().all()
+    response.headers["ETag"] = collection_etag(
+        (subscription.subscription_id, subscription.version) for subscription in subscriptions
+    )
+    logger.info("Found %s subscriptions for user %s", len(subscriptions), user_id)
     return subscriptions
 
-@router.get("/", response_model=List[Subscription])
-def get_subscriptions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logger.info(f"Fetching subscriptions with skip={skip}, limit={limit}")
+@router.get("/", response_model=List[Subscription], responses=NEXT_CURSOR_RESPONSES)
+@query_budget(1)
+async def get_subscriptions(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                            db: Session = Depends(get_read_db)):
+    logger.info("Fetching subscriptions with skip=%s, limit=%s, cursor=%s", skip, limit, cursor)
+    columns = row_columns(SubscriptionModel, Subscription) if FAST_JSON_ENABLED else [SubscriptionModel]
+    query = paginate(select(*columns), SubscriptionModel.subscription_id, skip, limit, cursor)
     try:
-        subscriptions = db.query(SubscriptionModel).offset(skip).limit(limit).all()
-        logger.info(f"Found {len(subscriptions)} subscriptions")
+        result = await execute(db, query)
+        if FAST_JSON_ENABLED:
+            rows = result.all()
+            set_next_cursor(response, rows, "subscription_id", limit)
+            logger.info("Found %s subscriptions", len(rows))
+            return rows_response(rows, response)
+        subscriptions = result.scalars().all()
+        set_next_cursor(response, subscriptions, "subscription_id", limit)
+        logger.info("Found %s subscriptions", len(subscriptions))
         return subscriptions
     except Exception as e:
-        logger.error(f"Error in get_subscriptions: {str(e)}")
+        logger.error("Error in get_subscriptions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{subscription_id}", response_model=Subscription)
+@query_budget(2)
 def update_subscription(subscription_id: int, 
                        subscription: SubscriptionUpdate, 
                        db: Session = Depends(get_db),
-                       current_user: UserModel = Depends(get_current_user)):
+                       current_user: Principal = Depends(get_current_principal)):
     db_subscription = db.query(SubscriptionModel).filter(SubscriptionModel.subscription_id == subscription_id).first()
     if db_subscription is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
@@ -104,26 +130,18 @@ def update_subscription(subscription_id: int,
     if db_subscription.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this subscription")
     
-    # Check if user exists if user_id is being updated
-    if subscription.user_id is not None:
-        user = db.query(UserModel).filter(UserModel.user_id == subscription.user_id).first()
-        if not user:
-            logger.error(f"User not found: {subscription.user_id}")
-            raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if plan exists if plan_id is being updated
-    if subscription.plan_id is not None:
-        plan = db.query(PlanModel).filter(PlanModel.plan_id == subscription.plan_id).first()
-        if not plan:
-            logger.error(f"Plan not found: {subscription.plan_id}")
-            raise HTTPException(status_code=404, detail="Plan not found")
-    
-    # Check if payment exists if payment_id is being updated
-    if subscription.payment_id is not None:
-        payment = db.query(PaymentModel).filter(PaymentModel.payment_id == subscription.payment_id).first()
-        if not payment:
-            logger.error(f"Payment not found: {subscription.payment_id}")
-            raise HTTPException(status_code=404, detail="Payment not found")
+    # Check any user, plan or payment being changed in one round trip
+    refs = check_subscription_references(db, user_id=subscription.user_id, plan_id=subscription.plan_id,
+                                         payment_id=subscription.payment_id)
+    if not refs["user"]:
+        logger.error("User not found: %s", subscription.user_id)
+        raise HTTPException(status_code=404, detail="User not found")
+    if not refs["plan"]:
+        logger.error("Plan not found: %s", subscription.plan_id)
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if not refs["payment"]:
+        logger.error("Payment not found: %s", subscription.payment_id)
+        raise HTTPException(status_code=404, detail="Payment not found")
     
     update_data = subscription.model_dump(exclude_unset=True)
     for key, value in update_data.items():
@@ -131,14 +149,14 @@ def update_subscription(subscription_id: int,
     
     db_subscription.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(db_subscription)
-    logger.info(f"Subscription {subscription_id} updated successfully")
+    logger.info("Subscription %s updated successfully", subscription_id)
     return db_subscription
 
 @router.delete("/{subscription_id}")
+@query_budget(2)
 def delete_subscription(subscription_id: int, 
                        db: Session = Depends(get_db),
-                       current_user: UserModel = Depends(get_current_user)):
+                       current_user: Principal = Depends(get_current_principal)):
     db_subscription = db.query(SubscriptionModel).filter(SubscriptionModel.subscription_id == subscription_id).first()
     if db_subscription is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
@@ -149,5 +167,5 @@ def delete_subscription(subscription_id: int,
     
     db.delete(db_subscription)
     db.commit()
-    logger.info(f"Subscription {subscription_id} deleted successfully")
+    logger.info("Subscription %s deleted successfully", subscription_id)
     return {"message": "Subscription deleted successfully"}
\ No newline at end of file
@@ -1,81 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database.db import get_db
-from app.schemas.user import UserCreate, User, UserUpdate, UserLogin, Token
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.database.db import get_db, get_read_db, execute, SessionLocal
+from app.database.pagination import NEXT_CURSOR_RESPONSES, paginate, set_next_cursor
+from app.database.fast_json import FAST_JSON_ENABLED, row_columns, rows_response
+from app.schemas.user import UserCreate, User, UserUpdate, UserLogin, Token, UserOverview
 from app.models.user import User as UserModel
-from app.auth.auth import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_user
-)
+from app.models.subscription import Subscription as SubscriptionModel
+from app.models.payment import Payment as PaymentModel
+from app.auth.auth import create_access_token, get_current_user, client_ip
+from app.auth.login_throttle import login_throttle
+from app.auth.credential_cache import credential_cache
+from app.auth.hashing import password_hasher
+from app.metrics import query_budget
 from datetime import datetime, timedelta
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+OVERVIEW_RECENT_PAYMENTS = int(os.getenv("USER_OVERVIEW_RECENT_PAYMENTS", "10"))
+
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str) -> None:
+    # Only replaces the hash that was verified, so a concurrent password change wins;
+    # updated_at is kept since the user didn't change anything
+    with SessionLocal() as db:
+        db.execute(
+            update(UserModel)
+            .where(UserModel.user_id == user_id, UserModel.password_hash == old_hash)
+            .values(password_hash=new_hash, updated_at=UserModel.updated_at)
+        )
+        db.commit()
+
 @router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(UserModel).filter(UserModel.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.password_hash):
+@query_budget(2)
+async def login(user_data: UserLogin, request: Request, db: Session = Depends(get_read_db)):
+    # Throttled callers get their 429 before the user lookup or any bcrypt work
+    login_throttle.check(user_data.email, client_ip(request))
+    result = await execute(db, select(UserModel).where(UserModel.email == user_data.email))
+    user = result.scalars().first()
+    valid, new_hash = False, None
+    if user is not None:
+        # bcrypt runs on the password hash pool; this handler holds no thread meanwhile
+        valid, new_hash = await password_hasher.verify_and_update(user_data.password, user.password_hash)
+    if not valid:
+        # May write to the shared throttle table, so keep it off the event loop
+        await run_in_threadpool(login_throttle.record_failure, user_data.email, client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Basic"},
         )
     
+    # The stored hash was made with a different BCRYPT_ROUNDS; upgrade it while we have the password
+    if new_hash is not None:
+        await run_in_threadpool(_store_rehashed_password, user.user_id, user.password_hash, new_hash)
+        credential_cache.invalidate_user(user.email)
+    
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "user_id": user.user_id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/", response_model=User)
-def create_user(user: UserCreate, 
-                db: Session = Depends(get_db),
-                current_user: UserModel = Depends(get_current_user)):
+@query_budget(3)
+async def create_user(user: UserCreate, 
+                      db: Session = Depends(get_db),
+                      current_user: UserModel = Depends(get_current_user)):
     # Check if user already exists
-    db_user = db.query(UserModel).filter(UserModel.email == user.email).first()
-    if db_user:
+    result = await execute(db, select(UserModel).where(UserModel.email == user.email))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = UserModel(
+        name=user.name,
         email=user.email,
+        phone=user.phone,
+        address=user.address,
         password_hash=hashed_password,
-        full_name=user.full_name,
-        is_active=user.is_active,
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow()
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await run_in_threadpool(db.commit)
     return db_user
 
 @router.get("/me", response_model=User)
+@query_budget(1)
 def read_users_me(current_user: UserModel = Depends(get_current_user)):
     return current_user
 
-@router.get("/", response_model=List[User])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(UserModel).offset(skip).limit(limit).all()
+@router.get("/", response_model=List[User], responses=NEXT_CURSOR_RESPONSES)
+@query_budget(1)
+async def get_users(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                    db: Session = Depends(get_read_db)):
+    if FAST_JSON_ENABLED:
+        query = select(*row_columns(UserModel, User))
+        rows = (await execute(db, paginate(query, UserModel.user_id, skip, limit, cursor))).all()
+        set_next_cursor(response, rows, "user_id", limit)
+        return rows_response(rows, response)
+    result = await execute(db, paginate(select(UserModel), UserModel.user_id, skip, limit, cursor))
+    users = result.scalars().all()
+    set_next_cursor(response, users, "user_id", limit)
     return users
 
 @router.get("/{user_id}", response_model=User)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.user_id == user_id).first()
+@query_budget(1)
+async def get_user(user_id: int, db: Session = Depends(get_read_db)):
+    result = await execute(db, select(UserModel).where(UserModel.user_id == user_id))
+    db_user = result.scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
+@router.get("/{user_id}/overview", response_model=UserOverview)
+@query_budget(5)
+async def get_user_overview(user_id: int, db: Session = Depends(get_read_db)):
+    # Five SELECTs regardless of collection sizes: the user, one IN query per eager-loaded
+    # collection (devices, active subscriptions, their plans) and the recent payments
+    result = await execute(db, select(UserModel).where(UserModel.user_id == user_id).options(
+        selectinload(UserModel.devices),
+        selectinload(UserModel.subscriptions.and_(SubscriptionModel.status == "active"))
+        .selectinload(SubscriptionModel.plan),
+    ))
+    db_user = result.scalars().first()
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    # "Recent" needs a per-user LIMIT, which a collection loader can't express
+    result = await execute(db, select(PaymentModel).where(PaymentModel.user_id == user_id)
+                           .order_by(PaymentModel.payment_date.desc()).limit(OVERVIEW_RECENT_PAYMENTS))
+    return {
+        "user": db_user,
+        "devices": db_user.devices,
+        "active_subscriptions": db_user.subscriptions,
+        "recent_payments": result.scalars().all(),
+    }
+
 @router.put("/{user_id}", response_model=User)
-def update_user(user_id: int, 
-                user: UserUpdate, 
-                db: Session = Depends(get_db),
-                current_user: UserModel = Depends(get_current_user)):
-    db_user = db.query(UserModel).filter(UserModel.user_id == user_id).first()
+@query_budget(3)
+async def update_user(user_id: int, 
+                      user: UserUpdate, 
+                      db: Session = Depends(get_db),
+                      current_user: UserModel = Depends(get_current_user)):
+    result = await execute(db, select(UserModel).where(UserModel.user_id == user_id))
+    db_user = result.scalars().first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -86,16 +160,18 @@ def update_user(user_id: int,
     update_data = user.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         if key == "password":
-            setattr(db_user, "password_hash", get_password_hash(value))
+            if value is not None:
+                setattr(db_user, "password_hash", await password_hasher.hash(value))
+                credential_cache.invalidate_user(db_user.email)
         else:
             setattr(db_user, key, value)
     
     db_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_user)
+    await run_in_threadpool(db.commit)
     return db_user
 
 @router.delete("/{user_id}")
+@query_budget(3)
 def delete_user(user_id: int, 
                 db: Session = Depends(get_db),
                 current_user: UserModel = Depends(get_current_user)):
@@ -109,4 +185,5 @@ def delete_user(user_id: int,
     
     db.delete(db_user)
     db.commit()
+    credential_cache.invalidate_user(db_user.email)
     return {"message": "User deleted successfully"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class DeviceBase(BaseModel):
     user_id: int
@@ -25,4 +25,14 @@ class Device(DeviceBase):
     device_id: int
     added_on: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class DeviceBulkError(BaseModel):
+    row: int
+    error: str
+
+class DeviceBulkReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[DeviceBulkError]
+    errors_truncated: bool = False
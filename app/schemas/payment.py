@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 class PaymentBase(BaseModel):
@@ -25,4 +25,23 @@ class Payment(PaymentBase):
     payment_id: int
     payment_date: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class PaymentRollup(BaseModel):
+    day: date
+    plan_id: int
+    status: str
+    payment_count: int
+    amount_total: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class DailyRevenue(BaseModel):
+    day: date
+    payment_count: int
+    amount_total: float
+
+class PlanRevenue(BaseModel):
+    plan_id: int
+    payment_count: int
+    amount_total: float
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import date, datetime
 from typing import Optional
+from app.schemas.plan import Plan
 
 class SubscriptionBase(BaseModel):
     user_id: int
@@ -27,4 +28,7 @@ class Subscription(SubscriptionBase):
     subscription_id: int
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class SubscriptionWithPlan(Subscription):
+    plan: Optional[Plan] = None
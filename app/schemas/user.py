@@ -1,6 +1,9 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from app.schemas.device import Device
+from app.schemas.payment import Payment
+from app.schemas.subscription import SubscriptionWithPlan
 
 
 class UserBase(BaseModel):
@@ -10,7 +13,7 @@ class UserBase(BaseModel):
     address: Optional[str] = None
 
 class UserCreate(UserBase):
-    pass
+    password: str
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -32,3 +35,13 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+class Principal(BaseModel):
+    user_id: int
+    email: str
+
+class UserOverview(BaseModel):
+    user: User
+    devices: List[Device]
+    active_subscriptions: List[SubscriptionWithPlan]
+    recent_payments: List[Payment]
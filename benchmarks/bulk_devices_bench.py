@@ -0,0 +1,33 @@
+import os
+import time
+import httpx
+
+# Posts a generated NDJSON upload to a running API (httpx comes with
+# requirements-dev.txt), e.g.
+#   BENCH_USER_ID=1 BENCH_TOKEN=<bearer token> python benchmarks/bulk_devices_bench.py
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://127.0.0.1:8000")
+TOKEN = os.getenv("BENCH_TOKEN", "")
+USER_ID = int(os.getenv("BENCH_USER_ID", "1"))
+DEVICES = int(os.getenv("BENCH_DEVICES", "100000"))
+
+
+def generate_ndjson():
+    prefix = int(time.time())
+    for i in range(DEVICES):
+        yield (
+            f'{{"user_id":{USER_ID},"imei_number":"{prefix}{i:08d}",'
+            f'"device_type":"tracker","model":"bench","status":"active"}}\n'
+        ).encode()
+
+
+if __name__ == "__main__":
+    headers = {"Content-Type": "application/x-ndjson", "Authorization": f"Bearer {TOKEN}"}
+    start = time.perf_counter()
+    response = httpx.post(f"{BASE_URL}/devices/bulk", content=generate_ndjson(), headers=headers, timeout=None)
+    elapsed = time.perf_counter() - start
+    report = response.json()
+    print(f"status:      {response.status_code}")
+    print(f"inserted:    {report.get('inserted')}")
+    print(f"failed:      {report.get('failed')}")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {DEVICES / elapsed:,.0f} devices/s")
@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Seeded throwaway SQLite databases; cheap bcrypt so the run stays fast
+workdir = tempfile.mkdtemp(prefix="query_budgets_")
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/main.db"
+os.environ["SESSION_DATABASE_URL"] = f"sqlite:///{workdir}/session.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("LOGIN_THROTTLE_ENABLED", "false")
+
+from datetime import date, timedelta
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.database.db import Base, SessionLocal, engine
+from app.database.session_db import Base as SessionBase, engine as session_engine
+from app.auth.auth import create_access_token, get_password_hash
+from app.models.user import User
+from app.models.plan import Plan
+from app.models.payment import Payment
+from app.models.subscription import Subscription
+from app.models.device import Device
+from app.models.session import Session
+
+# The same statement text this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+# Collections are seeded larger than the threshold so per-row lookups show up
+SEEDED_ROWS = 10
+
+EMAIL, PASSWORD = "owner@example.com", "owner-password"
+bearer = {"Authorization": "Bearer " + create_access_token({"sub": EMAIL, "user_id": 1})}
+basic = (EMAIL, PASSWORD)
+today = date.today()
+
+bulk_body = "\n".join(
+    json.dumps({"user_id": 1, "imei_number": f"{i:015d}", "device_type": "tracker", "model": "T1", "status": "active"})
+    for i in range(SEEDED_ROWS)
+)
+
+# One request per route, run in order; deletes come last and remove rows no
+# other case needs. A route without a case here fails the check.
+CASES = [
+    ("POST", "/users/login", {"json": {"email": EMAIL, "password": PASSWORD}}),
+    ("POST", "/users/", {"auth": basic, "json": {"name": "New", "email": "new@example.com", "password": "pw"}}),
+    ("GET", "/users/me", {"auth": basic}),
+    ("GET", "/users/", {}),
+    ("GET", "/users/1", {}),
+    ("GET", "/users/1/overview", {}),
+    ("PUT", "/users/1", {"auth": basic, "json": {"name": "Owner", "email": EMAIL, "phone": "555"}}),
+    ("POST", "/devices/", {"headers": bearer, "json": {
+        "user_id": 1, "imei_number": "356938035643809", "device_type": "tracker", "model": "T1", "status": "active"}}),
+    ("POST", "/devices/bulk", {"headers": {**bearer, "Content-Type": "application/x-ndjson"}, "content": bulk_body}),
+    ("GET", "/devices/1", {}),
+    ("GET", "/devices/user/1", {}),
+    ("GET", "/devices/", {}),
+    ("PUT", "/devices/1", {"headers": bearer, "json": {"status": "inactive"}}),
+    ("GET", "/subscriptions/test", {}),
+    ("POST", "/subscriptions/", {"headers": bearer, "json": {
+        "user_id": 1, "plan_id": 1, "start_date": str(today), "end_date": str(today + timedelta(days=30)),
+        "status": "active", "renewal_type": "auto", "payment_id": 1}}),
+    ("GET", "/subscriptions/1", {}),
+    ("GET", "/subscriptions/user/1", {}),
+    ("GET", "/subscriptions/", {}),
+    ("PUT", "/subscriptions/1", {"headers": bearer, "json": {"renewal_type": "manual"}}),
+    ("POST", "/plans/", {"headers": bearer, "json": {
+        "product_id": 1, "name": "Pro", "price": 19.99, "duration_days": 30, "features": {}, "is_active": True}}),
+    ("GET", "/plans/1", {}),
+    ("GET", "/plans/", {}),
+    ("PUT", "/plans/2", {"headers": bearer, "json": {"price": 24.99}}),
+    ("GET", "/payments/test", {}),
+    ("POST", "/payments/", {"headers": bearer, "json": {
+        "user_id": 1, "plan_id": 1, "amount": 9.99, "payment_method": "card", "status": "paid",
+        "transaction_id": "txn-new"}}),
+    ("GET", "/payments/export", {"headers": bearer}),
+    ("GET", "/payments/analytics", {"headers": bearer}),
+    ("GET", "/payments/analytics/daily", {"headers": bearer}),
+    ("GET", "/payments/analytics/plans", {"headers": bearer}),
+    ("GET", "/payments/1", {}),
+    ("GET", "/payments/user/1", {}),
+    ("GET", "/payments/subscription/1", {}),
+    ("PUT", "/payments/1", {"headers": bearer, "json": {"status": "refunded", "amount": 4.99}}),
+    ("POST", "/sessions/", {"headers": bearer, "json": {
+        "user_id": 1, "token": "budget-token", "ip_address": "127.0.0.1", "device_info": "check"}}),
+    ("GET", "/sessions/current", {"headers": {"X-Session-Token": "budget-token"}}),
+    ("PUT", "/sessions/1", {"headers": bearer, "json": {"device_info": "renamed"}}),
+    ("GET", "/internal/pool", {}),
+    ("GET", "/internal/password-hashing", {}),
+    ("GET", "/internal/login-throttle", {}),
+    ("GET", "/internal/logging", {}),
+    ("GET", "/metrics", {}),
+    ("DELETE", "/sessions/1", {"headers": bearer}),
+    ("DELETE", "/devices/2", {"headers": bearer}),
+    ("DELETE", "/subscriptions/2", {"headers": bearer}),
+    ("DELETE", "/payments/2", {"headers": bearer}),
+    ("DELETE", "/plans/2", {"headers": bearer}),
+    ("DELETE", "/users/2", {"auth": ("new@example.com", "pw")}),
+]
+
+statements = []
+
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    SessionBase.metadata.create_all(bind=session_engine)
+    with SessionLocal() as db:
+        db.add(User(name="Owner", email=EMAIL, password_hash=get_password_hash(PASSWORD)))
+        db.add(Plan(product_id=1, name="Basic", price=9.99, duration_days=30, features={}, is_active=True))
+        db.flush()
+        for i in range(SEEDED_ROWS):
+            db.add(Payment(user_id=1, plan_id=1, amount=9.99, payment_method="card", status="paid",
+                           transaction_id=f"txn-{i}"))
+        db.flush()
+        for i in range(SEEDED_ROWS):
+            db.add(Subscription(user_id=1, plan_id=1, start_date=today, end_date=today + timedelta(days=30),
+                                status="active", renewal_type="auto", payment_id=1))
+            db.add(Device(user_id=1, imei_number=f"{i:015d}", device_type="tracker", model="T1", status="active"))
+        db.commit()
+
+
+def find_route(method: str, path: str):
+    for route in app.routes:
+        if isinstance(route, APIRoute) and method in route.methods and route.path_regex.match(path):
+            return route
+    return None
+
+
+def main() -> int:
+    seed()
+    for target in (engine, session_engine):
+        event.listen(target, "before_cursor_execute", capture)
+    failures = []
+    covered = set()
+    with TestClient(app, raise_server_exceptions=False) as client:
+        print(f"{'route':<44} {'status':>6} {'queries':>8} {'budget':>7}")
+        for method, path, kwargs in CASES:
+            route = find_route(method, path)
+            if route is None:
+                failures.append(f"{method} {path}: no such route")
+                continue
+            covered.add((method, route.path))
+            statements.clear()
+            response = client.request(method, path, **kwargs)
+            budget = getattr(route.endpoint, "query_budget", None)
+            label = f"{method} {route.path}"
+            print(f"{label:<44} {response.status_code:>6} {len(statements):>8} {str(budget):>7}")
+            if response.status_code >= 400:
+                failures.append(f"{label}: returned {response.status_code}, fix the case: {response.text[:200]}")
+            if budget is None:
+                failures.append(f"{label}: no @query_budget declared")
+            elif len(statements) > budget:
+                failures.append(f"{label}: {len(statements)} queries, budget is {budget}")
+            for statement, count in Counter(statements).items():
+                if count >= N_PLUS_ONE_THRESHOLD:
+                    first_line = " ".join(statement.split())[:120]
+                    failures.append(f"{label}: same statement ran {count} times (N+1?): {first_line}")
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.endpoint.__module__.startswith("app.routers."):
+            for method in route.methods:
+                if (method, route.path) not in covered:
+                    failures.append(f"{method} {route.path}: no case in CASES")
+
+    if failures:
+        print(f"\n{len(failures)} problem(s):")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\nAll routes within their query budgets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
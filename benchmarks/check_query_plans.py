@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Runs EXPLAIN on the router queries against data shaped like production and fails
+# if any of them still scans a large table. Unless --no-seed is given, the
+# databases are filled by seed_load_data.py (at the volumes below, which BENCH_*
+# overrides) and ANALYZEd first, so the planner decides from real statistics
+# rather than an empty table. Point DATABASE_URL and SESSION_DATABASE_URL at
+# scratch Postgres databases for the plans production will get; the SQLite
+# defaults check the same queries against SQLite's planner.
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_query_plans.db")
+os.environ.setdefault("SESSION_DATABASE_URL", "sqlite:///./bench_query_plans_sessions.db")
+PLAN_CHECK_VOLUMES = {
+    "BENCH_USERS": "50000",
+    "BENCH_PAYMENTS": "500000",
+    "BENCH_SUBSCRIPTIONS": "50000",
+    "BENCH_DEVICES": "200000",
+    "BENCH_SESSIONS": "100000",
+}
+for name, value in PLAN_CHECK_VOLUMES.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import select, text
+from app.database.db import engine
+from app.database.session_db import engine as session_engine
+from app.models.user import User
+from app.models.payment import Payment
+from app.models.subscription import Subscription
+from app.models.device import Device
+from app.models.session import Session
+import seed_load_data
+from seed_load_data import EPOCH, bench_email
+
+# Tables that grow without bound; a sequential scan on any of them fails the check
+LARGE_TABLES = {"users", "devices", "subscriptions", "payments", "sessions"}
+
+now = datetime.utcnow()
+# Literals below pick rows the seed actually created, so estimates match real lookups
+export_start = EPOCH + timedelta(days=365)
+
+# The filters the routers and auth paths issue on every request
+MAIN_QUERIES = {
+    "get_current_user": select(User).where(User.email == bench_email(1)),
+    "get_user": select(User).where(User.user_id == 1),
+    "get_users (cursor)": select(User).where(User.user_id > 1000).order_by(User.user_id).limit(100),
+    "get_device": select(Device).where(Device.device_id == 1),
+    "get_user_devices": select(Device).where(Device.user_id == 1),
+    "get_devices (cursor)": select(Device).where(Device.device_id > 1000).order_by(Device.device_id).limit(100),
+    "device by imei": select(Device).where(Device.imei_number == f"35{1:013d}"),
+    "get_subscription": select(Subscription).where(Subscription.subscription_id == 1),
+    "get_user_subscriptions": select(Subscription).where(Subscription.user_id == 1),
+    "create_device active subscription": select(Subscription).where(
+        Subscription.user_id == 1, Subscription.status == "active"
+    ),
+    "subscription expiry sweep": select(Subscription.subscription_id).where(
+        Subscription.status == "active", Subscription.end_date < now.date()
+    ).limit(5000),
+    "get_payment": select(Payment).where(Payment.payment_id == 1),
+    "get_user_payments": select(Payment).where(Payment.user_id == 1),
+    "export_payments": select(Payment).where(
+        Payment.payment_date >= export_start, Payment.payment_date < export_start + timedelta(days=30)
+    ).order_by(Payment.payment_id),
+}
+
+SESSION_QUERIES = {
+    "get_session_by_token": select(Session).where(Session.token == "bench-session-1"),
+    "get_active_sessions_for_user": select(Session).where(Session.user_id == 1, Session.expires_at > now),
+}
+
+def _seq_scans(plan_node):
+    if plan_node.get("Node Type") == "Seq Scan":
+        yield plan_node.get("Relation Name")
+    for child in plan_node.get("Plans", []):
+        yield from _seq_scans(child)
+
+def explain_postgres(conn, sql: str):
+    # (tables read by a sequential scan, summary of the plan)
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+    return set(_seq_scans(plan)), f"{plan['Node Type']}, estimated {plan['Plan Rows']} rows"
+
+def explain_sqlite(conn, sql: str):
+    # Full table scans show up as "SCAN <table>"; index use as SEARCH or "SCAN ... USING"
+    details = [row[3] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    scanned = set()
+    for detail in details:
+        words = detail.split()
+        if words[0] == "SCAN" and "USING" not in words:
+            scanned.add(words[2] if words[1] == "TABLE" else words[1])
+    return scanned, "; ".join(details)
+
+def check(target_engine, queries) -> list:
+    explain = explain_postgres if target_engine.dialect.name == "postgresql" else explain_sqlite
+    failures = []
+    with target_engine.connect() as conn:
+        for name, query in queries.items():
+            sql = str(query.compile(dialect=target_engine.dialect, compile_kwargs={"literal_binds": True}))
+            scanned, summary = explain(conn, sql)
+            scanned = sorted(scanned & LARGE_TABLES)
+            if scanned:
+                failures.append((name, scanned))
+                print(f"FAIL {name}: sequential scan on {', '.join(scanned)} ({summary})")
+            else:
+                print(f"ok   {name}: {summary}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a hot router query plans a sequential scan")
+    parser.add_argument("--no-seed", action="store_true",
+                        help="check the databases as they are (already seeded and analyzed)")
+    args = parser.parse_args()
+    if not args.no_seed:
+        seed_load_data.main()
+    failures = check(engine, MAIN_QUERIES) + check(session_engine, SESSION_QUERIES)
+    if failures:
+        print(f"{len(failures)} queries would scan a large table")
+        sys.exit(1)
+    print("All queries use an index")
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+# Start the API first, once with ASYNC_DB_ENABLED=false and once with true, e.g.
+#   ASYNC_DB_ENABLED=true uvicorn app.main:app --workers 1
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://127.0.0.1:8000")
+PATHS = os.getenv("BENCH_PATHS", "/devices/?limit=20,/plans/,/subscriptions/?limit=20").split(",")
+CONCURRENCY_LEVELS = [int(c) for c in os.getenv("BENCH_CONCURRENCY", "50,200,1000").split(",")]
+REQUESTS_PER_CLIENT = int(os.getenv("BENCH_REQUESTS_PER_CLIENT", "20"))
+
+
+async def client_loop(client: httpx.AsyncClient, latencies: list, errors: list):
+    for i in range(REQUESTS_PER_CLIENT):
+        path = PATHS[i % len(PATHS)]
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], []
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+async def main():
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for concurrency in CONCURRENCY_LEVELS:
+        r = await run_level(concurrency)
+        print(f"{r['concurrency']:>8} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
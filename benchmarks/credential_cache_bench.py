@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Run against a throwaway SQLite database unless one is configured
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_credential_cache.db")
+
+from fastapi.security import HTTPBasicCredentials
+from app.database.db import Base, engine, SessionLocal
+from app.models.user import User
+from app.auth.auth import authenticate_basic, get_password_hash
+from app.auth.credential_cache import credential_cache
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+
+
+def seed_user():
+    Base.metadata.create_all(bind=engine, tables=[User.__table__])
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.email == EMAIL).first():
+            db.add(User(name="Bench", email=EMAIL, password_hash=get_password_hash(PASSWORD)))
+            db.commit()
+    finally:
+        db.close()
+
+
+def run(enabled: bool) -> float:
+    credential_cache.clear()
+    credential_cache.enabled = enabled
+    credentials = HTTPBasicCredentials(username=EMAIL, password=PASSWORD)
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            authenticate_basic(credentials, db)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return REQUESTS / elapsed
+
+
+if __name__ == "__main__":
+    seed_user()
+    without_cache = run(enabled=False)
+    with_cache = run(enabled=True)
+    print(f"requests:        {REQUESTS}")
+    print(f"without cache:   {without_cache:,.0f} req/s")
+    print(f"with cache:      {with_cache:,.0f} req/s")
+    print(f"speedup:         {with_cache / without_cache:,.1f}x")
+    print(f"cache stats:     {credential_cache.stats()}")
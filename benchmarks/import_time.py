@@ -0,0 +1,43 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# Measures the cost of importing app.main with `python -X importtime` and fails when it
+# exceeds IMPORT_BUDGET_MS, so slow work creeping back into the import path is caught
+project_root = str(Path(__file__).parent.parent)
+MODULE = os.getenv("IMPORT_MODULE", "app.main")
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+TOP = int(os.getenv("IMPORT_TOP", "15"))
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure():
+    env = dict(os.environ, PYTHONPATH=project_root)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(proc.returncode)
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return entries
+
+
+if __name__ == "__main__":
+    entries = measure()
+    total_ms = next(cum for name, _, cum, _ in entries if name == MODULE) / 1000
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us, _ in sorted(entries, key=lambda e: e[1], reverse=True)[:TOP]:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name}")
+    print(f"\nimport {MODULE}: {total_ms:.1f} ms (budget {BUDGET_MS:.0f} ms)")
+    if total_ms > BUDGET_MS:
+        sys.exit(1)
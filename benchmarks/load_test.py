@@ -0,0 +1,409 @@
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+import httpx
+
+# Drives a running API over HTTP with a weighted mix of requests across the
+# user, device, subscription, plan, payment and session routers, then reports
+# latency percentiles and throughput per route. Seed the database first and
+# start the server the way it is deployed, e.g.
+#   pip install -r requirements-dev.txt
+#   python benchmarks/seed_load_data.py
+#   uvicorn app.main:app --workers 4
+#   python benchmarks/load_test.py
+# Results are written as JSON with sorted keys, so two runs can be diffed directly
+# or with: python benchmarks/load_test.py compare before.json after.json
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://127.0.0.1:8000")
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+DURATION = float(os.getenv("BENCH_DURATION", "60"))
+# Requests finishing during the warm-up are sent but not counted
+WARMUP = float(os.getenv("BENCH_WARMUP", "5"))
+# Comma-separated scenario names to run (see SCENARIOS); all of them by default
+ONLY = [name for name in os.getenv("BENCH_ONLY", "").split(",") if name]
+SEED = int(os.getenv("BENCH_SEED", "42"))
+OUTPUT = os.getenv("BENCH_OUTPUT")
+
+# Must match what seed_load_data.py was run with
+USERS = int(os.getenv("BENCH_USERS", "100000"))
+PLANS = int(os.getenv("BENCH_PLANS", "20"))
+PAYMENTS = int(os.getenv("BENCH_PAYMENTS", "5000000"))
+SUBSCRIPTIONS = int(os.getenv("BENCH_SUBSCRIPTIONS", str(USERS)))
+DEVICES = int(os.getenv("BENCH_DEVICES", "1000000"))
+PASSWORD = os.getenv("BENCH_PASSWORD", "bench-password")
+
+# A relative change smaller than this is not flagged by compare
+COMPARE_THRESHOLD = float(os.getenv("BENCH_COMPARE_THRESHOLD", "0.10"))
+
+
+def bench_email(user_id: int) -> str:
+    return f"user{user_id}@bench.example.com"
+
+
+class Recorder:
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, route: str, seconds: float, status) -> None:
+        if time.perf_counter() < self.measure_from:
+            return
+        self.latencies.setdefault(route, []).append(seconds)
+        counts = self.statuses.setdefault(route, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class VirtualUser:
+    # One simulated client: logs in as a seeded user, then acts on that user's
+    # data and on rows it created itself, so ownership checks pass
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, user_id: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.user_id = user_id
+        self.email = bench_email(user_id)
+        self.auth_headers = {}
+
+    async def request(self, route: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            # Streams (the export) are timed to the last byte
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(route, time.perf_counter() - start, status)
+        return response if response is not None and response.status_code < 400 else None
+
+    async def login(self) -> bool:
+        response = await self.request("POST /users/login", "POST", "/users/login",
+                                      json={"email": self.email, "password": PASSWORD})
+        if response is None:
+            return False
+        self.auth_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    def any_user(self) -> int:
+        return self.rng.randint(1, USERS)
+
+    # Reads
+
+    async def read_user(self):
+        await self.request("GET /users/{user_id}", "GET", f"/users/{self.any_user()}")
+
+    async def read_user_overview(self):
+        await self.request("GET /users/{user_id}/overview", "GET", f"/users/{self.any_user()}/overview")
+
+    async def list_users(self):
+        await self.request("GET /users/", "GET", "/users/", params={"limit": 100})
+
+    async def read_me(self):
+        # Basic auth on purpose: this is the bcrypt / credential-cache path
+        await self.request("GET /users/me", "GET", "/users/me", auth=(self.email, PASSWORD))
+
+    async def read_device(self):
+        await self.request("GET /devices/{device_id}", "GET", f"/devices/{self.rng.randint(1, DEVICES)}")
+
+    async def list_user_devices(self):
+        await self.request("GET /devices/user/{user_id}", "GET", f"/devices/user/{self.any_user()}")
+
+    async def list_devices(self):
+        await self.request("GET /devices/", "GET", "/devices/", params={"limit": 100})
+
+    async def read_subscription(self):
+        await self.request("GET /subscriptions/{subscription_id}", "GET",
+                           f"/subscriptions/{self.rng.randint(1, SUBSCRIPTIONS)}")
+
+    async def list_user_subscriptions(self):
+        await self.request("GET /subscriptions/user/{user_id}", "GET", f"/subscriptions/user/{self.any_user()}")
+
+    async def list_subscriptions(self):
+        await self.request("GET /subscriptions/", "GET", "/subscriptions/", params={"limit": 100})
+
+    async def read_plan(self):
+        await self.request("GET /plans/{plan_id}", "GET", f"/plans/{self.rng.randint(1, PLANS)}")
+
+    async def list_plans(self):
+        await self.request("GET /plans/", "GET", "/plans/")
+
+    async def read_payment(self):
+        await self.request("GET /payments/{payment_id}", "GET", f"/payments/{self.rng.randint(1, PAYMENTS)}")
+
+    async def list_user_payments(self):
+        await self.request("GET /payments/user/{user_id}", "GET", f"/payments/user/{self.any_user()}")
+
+    async def list_subscription_payments(self):
+        await self.request("GET /payments/subscription/{subscription_id}", "GET",
+                           f"/payments/subscription/{self.rng.randint(1, SUBSCRIPTIONS)}")
+
+    async def export_payments(self):
+        # One day of payments; the full table would measure nothing but the network
+        day = datetime(2024, 1, 1) + timedelta(days=self.rng.randrange(730))
+        await self.request("GET /payments/export", "GET", "/payments/export", headers=self.auth_headers,
+                           params={"start_date": day.isoformat(), "end_date": (day + timedelta(days=1)).isoformat()})
+
+    async def read_revenue(self):
+        await self.request("GET /payments/analytics/daily", "GET", "/payments/analytics/daily",
+                           headers=self.auth_headers, params={"start_date": "2024-01-01", "end_date": "2025-01-01"})
+
+    # Writes: each creates a row, updates it and deletes it again, so the
+    # dataset stays the size it was seeded at
+
+    async def device_lifecycle(self):
+        device = await self.request("POST /devices/", "POST", "/devices/", headers=self.auth_headers, json={
+            "user_id": self.user_id, "imei_number": uuid.uuid4().hex[:15],
+            "device_type": "tracker", "model": "bench", "status": "active",
+        })
+        if device is None:
+            return
+        device_id = device.json()["device_id"]
+        await self.request("PUT /devices/{device_id}", "PUT", f"/devices/{device_id}",
+                           headers=self.auth_headers, json={"status": "inactive"})
+        await self.request("DELETE /devices/{device_id}", "DELETE", f"/devices/{device_id}",
+                           headers=self.auth_headers)
+
+    async def subscription_lifecycle(self):
+        today = date.today()
+        subscription = await self.request("POST /subscriptions/", "POST", "/subscriptions/",
+                                          headers=self.auth_headers, json={
+            "user_id": self.user_id, "plan_id": self.rng.randint(1, PLANS),
+            "start_date": str(today), "end_date": str(today + timedelta(days=30)),
+            "status": "active", "renewal_type": "auto", "payment_id": self.rng.randint(1, PAYMENTS),
+        })
+        if subscription is None:
+            return
+        subscription_id = subscription.json()["subscription_id"]
+        await self.request("PUT /subscriptions/{subscription_id}", "PUT", f"/subscriptions/{subscription_id}",
+                           headers=self.auth_headers, json={"renewal_type": "manual"})
+        await self.request("DELETE /subscriptions/{subscription_id}", "DELETE",
+                           f"/subscriptions/{subscription_id}", headers=self.auth_headers)
+
+    async def payment_lifecycle(self):
+        payment = await self.request("POST /payments/", "POST", "/payments/", headers=self.auth_headers, json={
+            "user_id": self.user_id, "plan_id": self.rng.randint(1, PLANS), "amount": 9.99,
+            "payment_method": "card", "status": "pending", "transaction_id": uuid.uuid4().hex,
+        })
+        if payment is None:
+            return
+        payment_id = payment.json()["payment_id"]
+        await self.request("PUT /payments/{payment_id}", "PUT", f"/payments/{payment_id}",
+                           headers=self.auth_headers, json={"status": "paid"})
+        await self.request("DELETE /payments/{payment_id}", "DELETE", f"/payments/{payment_id}",
+                           headers=self.auth_headers)
+
+    async def plan_lifecycle(self):
+        # Every plan write invalidates the catalog in each worker, hence the low weight
+        plan = await self.request("POST /plans/", "POST", "/plans/", headers=self.auth_headers, json={
+            "product_id": 1, "name": "Bench plan", "price": 4.99, "duration_days": 30,
+            "features": {}, "is_active": False,
+        })
+        if plan is None:
+            return
+        plan_id = plan.json()["plan_id"]
+        await self.request("PUT /plans/{plan_id}", "PUT", f"/plans/{plan_id}",
+                           headers=self.auth_headers, json={"price": 5.99})
+        await self.request("DELETE /plans/{plan_id}", "DELETE", f"/plans/{plan_id}", headers=self.auth_headers)
+
+    async def session_lifecycle(self):
+        session = await self.request("POST /sessions/", "POST", "/sessions/", headers=self.auth_headers, json={
+            "user_id": self.user_id, "token": uuid.uuid4().hex, "ip_address": "127.0.0.1", "device_info": "bench",
+        })
+        if session is None:
+            return
+        session_id = session.json()["session_id"]
+        await self.request("PUT /sessions/{session_id}", "PUT", f"/sessions/{session_id}",
+                           headers=self.auth_headers, json={"device_info": "bench-updated"})
+        await self.request("DELETE /sessions/{session_id}", "DELETE", f"/sessions/{session_id}",
+                           headers=self.auth_headers)
+
+    async def user_lifecycle(self):
+        # create needs Basic auth as an existing user and delete needs it as the new
+        # one, so this costs several bcrypt verifications on the server
+        email = f"{uuid.uuid4().hex}@bench.example.com"
+        user = await self.request("POST /users/", "POST", "/users/", auth=(self.email, PASSWORD), json={
+            "name": "Bench signup", "email": email, "password": PASSWORD,
+        })
+        if user is None:
+            return
+        user_id = user.json()["user_id"]
+        await self.request("PUT /users/{user_id}", "PUT", f"/users/{user_id}", auth=(email, PASSWORD),
+                           json={"name": "Bench signup", "email": email, "phone": "5550000000"})
+        await self.request("DELETE /users/{user_id}", "DELETE", f"/users/{user_id}", auth=(email, PASSWORD))
+
+
+# (name, relative weight); roughly the read-heavy shape of tracker and dashboard traffic
+SCENARIOS = [
+    ("read_user", 5),
+    ("read_user_overview", 5),
+    ("list_users", 2),
+    ("read_me", 2),
+    ("read_device", 15),
+    ("list_user_devices", 10),
+    ("list_devices", 3),
+    ("read_subscription", 5),
+    ("list_user_subscriptions", 10),
+    ("list_subscriptions", 2),
+    ("read_plan", 8),
+    ("list_plans", 5),
+    ("read_payment", 4),
+    ("list_user_payments", 5),
+    ("list_subscription_payments", 2),
+    ("export_payments", 1),
+    ("read_revenue", 1),
+    ("device_lifecycle", 3),
+    ("subscription_lifecycle", 2),
+    ("payment_lifecycle", 2),
+    ("plan_lifecycle", 1),
+    ("session_lifecycle", 3),
+    ("user_lifecycle", 1),
+]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank, so small samples report a latency that was actually observed
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: list, statuses: dict, errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / seconds, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def git_commit() -> dict:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"sha": None, "dirty": None}
+    return {"sha": sha, "dirty": dirty}
+
+
+async def client_loop(index: int, client: httpx.AsyncClient, recorder: Recorder, scenarios: list, deadline: float):
+    rng = random.Random(f"{SEED}:{index}")
+    # Spread the virtual users over the seeded ones without repeats
+    vu = VirtualUser(client, recorder, rng, 1 + (index * 7919) % USERS)
+    if not await vu.login():
+        return
+    names = [name for name, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+    while time.perf_counter() < deadline:
+        await getattr(vu, rng.choices(names, weights)[0])()
+
+
+async def run() -> dict:
+    scenarios = [(name, weight) for name, weight in SCENARIOS if not ONLY or name in ONLY]
+    if not scenarios:
+        raise SystemExit(f"BENCH_ONLY matched no scenario; choose from {', '.join(name for name, _ in SCENARIOS)}")
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    recorder = Recorder(measure_from=start + WARMUP)
+    deadline = start + WARMUP + DURATION
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(client_loop(i, client, recorder, scenarios, deadline) for i in range(CONCURRENCY)))
+    # In-flight requests at the deadline still count, so measure to when the last one ended
+    measured = max(time.perf_counter() - recorder.measure_from, 1e-9)
+
+    endpoints = {
+        route: summarize(latencies, recorder.statuses[route], recorder.errors.get(route, 0), measured)
+        for route, latencies in recorder.latencies.items()
+    }
+    all_latencies = [seconds for latencies in recorder.latencies.values() for seconds in latencies]
+    all_statuses = {}
+    for counts in recorder.statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at.isoformat(timespec="seconds") + "Z",
+            "base_url": BASE_URL,
+            "concurrency": CONCURRENCY,
+            "duration_s": DURATION,
+            "warmup_s": WARMUP,
+            "measured_s": round(measured, 3),
+            "seed": SEED,
+            "scenarios": dict(scenarios),
+            "dataset": {
+                "users": USERS, "plans": PLANS, "payments": PAYMENTS,
+                "subscriptions": SUBSCRIPTIONS, "devices": DEVICES,
+            },
+        },
+        "endpoints": endpoints,
+        "total": summarize(all_latencies, all_statuses, sum(recorder.errors.values()), measured)
+        if all_latencies else None,
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"{'route':<46} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = sorted(result["endpoints"].items())
+    if result["total"] is not None:
+        rows.append(("total", result["total"]))
+    for route, r in rows:
+        print(f"{route:<46} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+
+def compare(before_path: str, after_path: str) -> int:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before_path} ({before['meta']['commit']['sha']}) -> {after_path} ({after['meta']['commit']['sha']})")
+    print(f"{'route':<46} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}")
+    regressions = 0
+    for route in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(route), after["endpoints"].get(route)
+        if old is None or new is None:
+            print(f"{route:<46} {'only in ' + (after_path if old is None else before_path)}")
+            continue
+        cells = []
+        for key, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("rps", False)):
+            change = (new[key] - old[key]) / old[key] if old[key] else 0.0
+            worse = change > COMPARE_THRESHOLD if higher_is_worse else change < -COMPARE_THRESHOLD
+            regressions += worse
+            cells.append(f"{change:>+7.0%}{'!' if worse else ' '}")
+        print(f"{route:<46} {''.join(cells)}")
+    print(f"\n{regressions} change(s) worse than {COMPARE_THRESHOLD:.0%} marked with !")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        return compare(sys.argv[2], sys.argv[3])
+    result = asyncio.run(run())
+    print_report(result)
+    output = OUTPUT or f"bench_load_{(result['meta']['commit']['sha'] or 'unknown')[:12]}.json"
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Run against a throwaway SQLite database unless one is configured
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_pagination.db")
+
+from sqlalchemy import func, insert, select
+from app.database.db import Base, engine, SessionLocal
+from app.database.pagination import encode_cursor, paginate
+from app.models.user import User
+from app.models.plan import Plan
+from app.models.payment import Payment
+from app.models.subscription import Subscription
+from app.models.device import Device
+
+ROWS = int(os.getenv("BENCH_ROWS", "500000"))
+PAGE_SIZE = int(os.getenv("BENCH_PAGE_SIZE", "100"))
+REPEATS = int(os.getenv("BENCH_REPEATS", "5"))
+
+
+def seed_devices():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(Device)).scalar()
+        batch = []
+        for i in range(existing, ROWS):
+            batch.append({"imei_number": f"{i:015d}", "device_type": "tracker", "model": "bench", "status": "active"})
+            if len(batch) == 10_000:
+                conn.execute(insert(Device), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Device), batch)
+
+
+def time_page(db, query) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        db.execute(query).all()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    seed_devices()
+    db = SessionLocal()
+    try:
+        print(f"{'depth':>8} {'offset ms':>10} {'cursor ms':>10}")
+        for depth in [0, ROWS // 100, ROWS // 10, ROWS // 2, ROWS - PAGE_SIZE]:
+            # The row at position `depth` is the last key a cursor client would hold
+            last_key = db.execute(
+                select(Device.device_id).order_by(Device.device_id).offset(depth).limit(1)
+            ).scalar()
+            offset_query = paginate(select(Device), Device.device_id, depth, PAGE_SIZE)
+            cursor_query = paginate(select(Device), Device.device_id, 0, PAGE_SIZE, encode_cursor(last_key - 1))
+            print(f"{depth:>8} {time_page(db, offset_query):>10.2f} {time_page(db, cursor_query):>10.2f}")
+    finally:
+        db.close()
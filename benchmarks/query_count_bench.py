@@ -0,0 +1,120 @@
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Run against throwaway SQLite databases unless real ones are configured
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_query_count_main.db")
+os.environ.setdefault("SESSION_DATABASE_URL", "sqlite:///./bench_query_count_session.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.main import app
+from app.database.db import Base, SessionLocal, engine
+from app.database.session_db import (
+    Base as SessionBase, SessionLocal as SessionDbLocal, engine as session_engine
+)
+from app.auth.auth import create_access_token, get_password_hash
+from app.models.user import User
+
+# Counts the statements each write endpoint issues, twice: once as the handlers
+# used to behave (expire_on_commit=True plus a refresh of every written object
+# after commit) and once as configured now, and prints the difference.
+
+statements = []
+
+
+class RefreshingSession(Session):
+    # The old handlers' pattern: commit expires everything, then each written
+    # object is reloaded with db.refresh() so the response can be built from it
+    def commit(self) -> None:
+        written = list(self.new) + list(self.dirty)
+        super().commit()
+        for obj in written:
+            if obj in self:
+                self.refresh(obj)
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def run(client: TestClient, method: str, path: str, **kwargs):
+    statements.clear()
+    response = client.request(method, path, **kwargs)
+    return response, len(statements)
+
+
+def reset_databases():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionBase.metadata.drop_all(bind=session_engine)
+    SessionBase.metadata.create_all(bind=session_engine)
+    with SessionLocal() as db:
+        db.add(User(name="Seed", email="seed@example.com", password_hash=get_password_hash("seed")))
+        db.commit()
+
+
+def measure(baseline: bool) -> list:
+    for factory in (SessionLocal, SessionDbLocal):
+        factory.class_ = RefreshingSession if baseline else Session
+        factory.configure(expire_on_commit=baseline)
+    reset_databases()
+    results = []
+    with TestClient(app) as client:
+        # Bearer auth is stateless, so the counts below are the handlers' own statements
+        seed_token = create_access_token({"sub": "seed@example.com", "user_id": 1})
+        headers = {"Authorization": f"Bearer {seed_token}"}
+        user_body = {"name": "Bench", "email": "bench@example.com", "password": "secret"}
+        plan_body = {"product_id": 1, "name": "Basic", "price": 9.99, "duration_days": 30,
+                     "features": {"devices": 3}, "is_active": True}
+        payment_body = {"user_id": 1, "plan_id": 1, "amount": 9.99, "payment_method": "card",
+                        "status": "paid", "transaction_id": "txn-1"}
+        subscription_body = {"user_id": 1, "plan_id": 1, "start_date": "2026-01-01", "end_date": "2026-02-01",
+                             "status": "active", "renewal_type": "auto", "payment_id": 1}
+        device_body = {"user_id": 1, "imei_number": "356938035643809", "device_type": "tracker",
+                       "model": "T1", "status": "active"}
+        session_body = {"user_id": 1, "token": "bench-token", "ip_address": "127.0.0.1", "device_info": "bench"}
+
+        cases = [
+            ("POST", "/users/", {"json": user_body}),
+            ("PUT", "/users/1", {"json": {"name": "Renamed", "email": "seed@example.com", "password": "seed"}}),
+            ("POST", "/plans/", {"json": plan_body}),
+            ("PUT", "/plans/1", {"json": {"price": 12.5}}),
+            ("POST", "/payments/", {"json": payment_body}),
+            ("PUT", "/payments/1", {"json": {"status": "refunded"}}),
+            ("POST", "/subscriptions/", {"json": subscription_body}),
+            ("PUT", "/subscriptions/1", {"json": {"renewal_type": "manual"}}),
+            ("POST", "/devices/", {"json": device_body}),
+            ("PUT", "/devices/1", {"json": {"status": "inactive"}}),
+            ("POST", "/sessions/", {"json": session_body}),
+            ("PUT", "/sessions/1", {"json": {"device_info": "renamed"}}),
+        ]
+        for method, path, kwargs in cases:
+            if path.startswith("/users/"):
+                # The user routes still authenticate with Basic credentials
+                response, count = run(client, method, path, auth=("seed@example.com", "seed"), **kwargs)
+            else:
+                response, count = run(client, method, path, headers=headers, **kwargs)
+            results.append((f"{method} {path}", response.status_code, count))
+    return results
+
+
+if __name__ == "__main__":
+    for target in (engine, session_engine):
+        event.listen(target, "before_cursor_execute", count_statement)
+    baseline = measure(baseline=True)
+    current = measure(baseline=False)
+
+    print(f"{'endpoint':<24} {'status':>6} {'baseline':>9} {'current':>8} {'diff':>6}")
+    total_before = total_after = 0
+    for (endpoint, before_status, before), (_, status, after) in zip(baseline, current):
+        shown = str(status) if status == before_status else f"{before_status}/{status}"
+        print(f"{endpoint:<24} {shown:>6} {before:>9} {after:>8} {after - before:>+6}")
+        total_before += before
+        total_after += after
+    print(f"{'total':<24} {'':>6} {total_before:>9} {total_after:>8} {total_after - total_before:>+6}")
@@ -0,0 +1,193 @@
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Seeds the database load_test.py runs against. Point DATABASE_URL and
+# SESSION_DATABASE_URL at a local Postgres for numbers worth comparing; the
+# SQLite defaults are a stand-in for trying the harness out. Rows are
+# generated from BENCH_SEED, so the same sizes give the same data on every
+# machine. Expects empty tables (or ones this script filled) since children
+# pick their parents from ids 1..N. Re-running tops up tables still short of
+# their target, so an interrupted seed can be resumed.
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_load.db")
+os.environ.setdefault("SESSION_DATABASE_URL", "sqlite:///./bench_load_sessions.db")
+
+from sqlalchemy import func, insert, select, text
+from app.database.db import Base, engine
+from app.database.session_db import Base as SessionBase, engine as session_engine
+from app.auth.hashing import pwd_context
+from app.models.user import User
+from app.models.plan import Plan
+from app.models.payment import Payment
+from app.models.subscription import Subscription
+from app.models.device import Device
+from app.models.session import Session
+from app.models.payment_rollup import PaymentDailyRollup  # noqa: F401 -- created by create_all
+from app.database.payment_rollups import payment_date_range, rebuild_rollups
+
+# Keep these in step with the same variables in load_test.py
+USERS = int(os.getenv("BENCH_USERS", "100000"))
+PLANS = int(os.getenv("BENCH_PLANS", "20"))
+PAYMENTS = int(os.getenv("BENCH_PAYMENTS", "5000000"))
+SUBSCRIPTIONS = int(os.getenv("BENCH_SUBSCRIPTIONS", str(USERS)))
+DEVICES = int(os.getenv("BENCH_DEVICES", "1000000"))
+SESSIONS = int(os.getenv("BENCH_SESSIONS", str(USERS)))
+PASSWORD = os.getenv("BENCH_PASSWORD", "bench-password")
+SEED = int(os.getenv("BENCH_SEED", "42"))
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "10000"))
+
+# Fixed so the seeded dates, and so query plans over them, don't drift between runs
+EPOCH = datetime(2024, 1, 1)
+PAYMENT_METHODS = ("card", "paypal", "bank_transfer")
+PAYMENT_STATUSES = ("paid",) * 18 + ("refunded", "failed")
+DEVICE_TYPES = ("tracker", "collar", "dashcam")
+
+
+def bench_email(user_id: int) -> str:
+    return f"user{user_id}@bench.example.com"
+
+
+def user_rows(rng, start, stop, password_hash):
+    # One bcrypt hash for everyone: hashing 100k passwords would dominate the seed
+    for user_id in range(start, stop):
+        created_at = EPOCH + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        yield {
+            "name": f"Bench User {user_id}",
+            "email": bench_email(user_id),
+            "phone": f"555{user_id:07d}",
+            "password_hash": password_hash,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def plan_rows(rng, start, stop, _):
+    for plan_id in range(start, stop):
+        yield {
+            "product_id": 1 + plan_id % 3,
+            "name": f"Plan {plan_id}",
+            "price": round(rng.uniform(2, 50), 2),
+            "duration_days": rng.choice((30, 90, 365)),
+            "features": {"history_days": rng.choice((7, 30, 365))},
+            "is_active": plan_id % 10 != 0,
+            "created_at": EPOCH,
+        }
+
+
+def payment_rows(rng, start, stop, _):
+    for payment_id in range(start, stop):
+        yield {
+            "user_id": rng.randint(1, USERS),
+            "plan_id": rng.randint(1, PLANS),
+            "amount": round(rng.uniform(2, 50), 2),
+            "payment_method": rng.choice(PAYMENT_METHODS),
+            "status": rng.choice(PAYMENT_STATUSES),
+            "transaction_id": f"bench-{payment_id}",
+            "payment_date": EPOCH + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600)),
+        }
+
+
+def subscription_rows(rng, start, stop, _):
+    today = date.today()
+    for subscription_id in range(start, stop):
+        duration = rng.choice((30, 90, 365))
+        # The first USERS subscriptions give every user an active one (device
+        # creation requires it); the rest land on anyone and may have expired
+        first = subscription_id <= USERS
+        start_date = today - timedelta(days=rng.randrange(duration if first else 400))
+        end_date = start_date + timedelta(days=duration)
+        yield {
+            "user_id": subscription_id if first else rng.randint(1, USERS),
+            "plan_id": rng.randint(1, PLANS),
+            "start_date": start_date,
+            "end_date": end_date,
+            "status": "active" if end_date >= today else "expired",
+            "renewal_type": rng.choice(("auto", "manual")),
+            "payment_id": rng.randint(1, PAYMENTS),
+            "created_at": datetime.combine(start_date, datetime.min.time()),
+        }
+
+
+def device_rows(rng, start, stop, _):
+    for device_id in range(start, stop):
+        yield {
+            "user_id": rng.randint(1, USERS),
+            "subscription_id": rng.randint(1, SUBSCRIPTIONS) if rng.random() < 0.8 else None,
+            "imei_number": f"35{device_id:013d}",
+            "device_type": rng.choice(DEVICE_TYPES),
+            "model": f"M{rng.randint(1, 40)}",
+            "status": "active" if rng.random() < 0.9 else "inactive",
+            "added_on": EPOCH + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+        }
+
+
+def session_rows(rng, start, stop, _):
+    now = datetime.utcnow()
+    for session_id in range(start, stop):
+        yield {
+            "user_id": rng.randint(1, USERS),
+            "token": f"bench-session-{session_id}",
+            "ip_address": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            "device_info": rng.choice(DEVICE_TYPES),
+            "expires_at": now + timedelta(hours=rng.randint(-24, 24)),
+            "created_at": now - timedelta(hours=rng.randint(0, 48)),
+        }
+
+
+# Parents before children; (model, engine, target rows, row generator)
+TABLES = [
+    (User, engine, USERS, user_rows),
+    (Plan, engine, PLANS, plan_rows),
+    (Payment, engine, PAYMENTS, payment_rows),
+    (Subscription, engine, SUBSCRIPTIONS, subscription_rows),
+    (Device, engine, DEVICES, device_rows),
+    (Session, session_engine, SESSIONS, session_rows),
+]
+
+
+def seed_table(model, target_engine, target: int, make_rows, password_hash: str) -> None:
+    table = model.__tablename__
+    with target_engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(model)).scalar()
+    if existing >= target:
+        print(f"{table:<14} {existing:>10} rows, nothing to do")
+        return
+    started = time.perf_counter()
+    for batch_start in range(existing + 1, target + 1, BATCH_SIZE):
+        batch_stop = min(batch_start + BATCH_SIZE, target + 1)
+        # Seeded per batch so a resumed run produces the rows a single run would have
+        rng = random.Random(f"{SEED}:{table}:{batch_start}")
+        with target_engine.begin() as conn:
+            conn.execute(insert(model), list(make_rows(rng, batch_start, batch_stop, password_hash)))
+        done = batch_stop - 1 - existing
+        print(f"\r{table:<14} {batch_stop - 1:>10} / {target} rows "
+              f"({done / (time.perf_counter() - started):,.0f} rows/s)", end="", flush=True)
+    print()
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    SessionBase.metadata.create_all(bind=session_engine)
+    password_hash = pwd_context.hash(PASSWORD)
+    for model, target_engine, target, make_rows in TABLES:
+        seed_table(model, target_engine, target, make_rows, password_hash)
+    # Bulk inserts skip the inline rollup maintenance, so rebuild it from the seeded payments
+    covered = payment_date_range()
+    if covered is not None:
+        print(f"payment rollups {rebuild_rollups(*covered)['rollup_rows']:>10} rows")
+    # Fresh statistics, otherwise the first minutes of a run measure the planner guessing
+    for target_engine in (engine, session_engine):
+        with target_engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    print("Seed complete")
+
+
+if __name__ == "__main__":
+    main()
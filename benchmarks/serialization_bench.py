@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Run against a throwaway SQLite database unless one is configured
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_serialization.db")
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select
+from typing import List
+from app.database.db import Base, engine, SessionLocal
+from app.database.fast_json import row_columns, rows_response
+from app.models.payment import Payment
+from app.models.device import Device as DeviceModel
+from app.schemas.device import Device
+
+SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "100,1000,10000").split(",")]
+REPEATS = int(os.getenv("BENCH_REPEATS", "5"))
+
+device_list_adapter = TypeAdapter(List[Device])
+
+
+def seed_devices(rows: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(DeviceModel)).scalar()
+        batch = [
+            {"user_id": 1, "imei_number": f"{i:015d}", "device_type": "tracker", "model": "bench", "status": "active"}
+            for i in range(existing, rows)
+        ]
+        if batch:
+            conn.execute(insert(DeviceModel), batch)
+
+
+def orm_path(limit: int) -> bytes:
+    # What a response_model route does: ORM objects, from_attributes validation, then json.dumps
+    with SessionLocal() as db:
+        devices = db.execute(select(DeviceModel).order_by(DeviceModel.device_id).limit(limit)).scalars().all()
+        content = device_list_adapter.dump_python(
+            device_list_adapter.validate_python(devices, from_attributes=True), mode="json"
+        )
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast_path(limit: int) -> bytes:
+    with SessionLocal() as db:
+        query = select(*row_columns(DeviceModel, Device)).order_by(DeviceModel.device_id).limit(limit)
+        return rows_response(db.execute(query).all()).body
+
+
+def best_of(fn, limit: int) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(limit)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    seed_devices(max(SIZES))
+    assert orm_path(10) == fast_path(10), "fast path output differs from response_model output"
+    print(f"{'rows':>8} {'orm ms':>10} {'fast ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        orm_ms = best_of(orm_path, size)
+        fast_ms = best_of(fast_path, size)
+        print(f"{size:>8} {orm_ms:>10.2f} {fast_ms:>10.2f} {orm_ms / fast_ms:>7.1f}x")
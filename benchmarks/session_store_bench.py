@@ -0,0 +1,40 @@
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# Run against a throwaway SQLite database unless one is configured
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_session_store_main.db")
+os.environ.setdefault("SESSION_DATABASE_URL", "sqlite:///./bench_session_store.db")
+
+from app.database.session_db import Base, engine
+from app.auth.session import InMemorySessionStore, PostgresSessionStore, WriteBehindSessionStore
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "2000"))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "20000"))
+
+
+def run(name: str, store) -> None:
+    store.start()
+    tokens = [store.create(i % 500, "127.0.0.1", "bench").token for i in range(SESSIONS)]
+    if isinstance(store, WriteBehindSessionStore):
+        store.flush()
+    lookups = [random.choice(tokens) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for token in lookups:
+        assert store.get(token) is not None
+    elapsed = time.perf_counter() - start
+    print(f"{name:>14}: {LOOKUPS / elapsed:>12,.0f} lookups/s")
+    store.close()
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    run("postgres", PostgresSessionStore())
+    run("memory", InMemorySessionStore())
+    run("write_behind", WriteBehindSessionStore())